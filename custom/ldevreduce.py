@@ -3,6 +3,8 @@
 # KlipChop menu function
 import re
 
+import klipdedup
+
 
 def nlist2ranges(values, hex=False):
     rlist = []
@@ -22,7 +24,10 @@ def nlist2ranges(values, hex=False):
 
 # All kllipchop customizable modules must have a main function
 # The main function is passed three variables:
-#   textlines   - Generator of clipboard lines
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
 #   messagefunc - function to call with notification
 #   config      - configuration dictionary
 # The main function should return a string object or a list of strings
@@ -33,17 +38,18 @@ def main(textlines, messagefunc, config):
     """
 
     pattern = re.compile('([0-9A-F]{4,6})', re.IGNORECASE)
-    result = list()
-    count = 0
-    for line in textlines():
-        line = line.replace(':', '')
-        m = pattern.findall(line)
-        for ldev in m:
-            if len(ldev) == 6 and ldev.startswith('00'):
-                ldev = ldev[2:]
-            if ldev not in result:
-                result.append(ldev)
-                count += 1
+
+    def ldevs():
+        for line in textlines():
+            line = line.replace(':', '')
+            m = pattern.findall(line)
+            for ldev in m:
+                if len(ldev) == 6 and ldev.startswith('00'):
+                    ldev = ldev[2:]
+                yield ldev
+
+    result = klipdedup.unique(ldevs())   # at most 64K LDEVs per case, no budget needed
+    count = len(result)
 
     if config['LDEV-ranges']:
         result = nlist2ranges(result, hex=True)
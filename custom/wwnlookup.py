@@ -5,7 +5,10 @@
 
 # All kllipchop customizable modules must have a main function
 # The main function is passed three variables:
-#   textlines   - Generator of clipboard lines
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
 #   messagefunc - function to call with notification
 #   config      - configuration dictionary
 # The main function should return a string object or a list of strings
@@ -16,6 +19,8 @@ from dataclasses import dataclass
 
 from OuiLookup import OuiLookup
 
+CAPABILITIES = {'line_independent', 'streaming', 'cpu_bound'}
+
 RAIDMODEL = {
     '00': 'DF',
     '01': '7700E',
@@ -284,26 +289,37 @@ def ouidecoder(text):
     return result
 
 
+SUMMARY = 'Annotated {count} OUI'
+
+TAG = '   #'
+
+
+def mapline(line, config):
+    """
+    The line annotated with its decodes and how many there were, None for lines without when only extracting
+    """
+    decodes = ouidecoder(line)
+    if decodes:
+        line = line + TAG + TAG.join(decodes)
+    elif config['extract-WWN']:
+        return None, 0
+    return line, len(decodes) if decodes else 0
+
+
 def main(textlines, messagefunc, config):
     """
     KlipChop func to annotate WWN with decodes of Hitachi Storage
     """
 
-    tag = '   #'
     result = []
     count = 0
     for line in textlines():
-        decodes = ouidecoder(line)
-        if decodes:
-            line = line + tag + tag.join(decodes)
-            count += len(decodes)
+        line, n = mapline(line, config)
+        count += n
+        if line is not None:
+            result.append(line)
 
-        if config['extract-WWN'] and not decodes:
-            continue
-        result.append(line)
-        
-    result = '\n'.join(result)
-    messagefunc(f'Annotated {count} OUI')
+    messagefunc(SUMMARY.format(count=count))
     return result
 
 
@@ -0,0 +1,535 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipbench.py - Benchmark harness for KlipChop transforms.
+
+"""
+klipbench.py  - Call each transform's main() directly against generated
+storage admin datasets and record how time and memory scale with size.
+
+    python klipbench.py [-s 1000,10000,100000] [-t uniquelines,calculator] [-d ldev,csv10]
+    python klipbench.py --save baseline.json
+    python klipbench.py --baseline baseline.json [--threshold 0.25]
+    python klipbench.py --clipboard [-e inline|stream|parallel|auto] ...
+    python klipbench.py -t uniquecount -c count-mode=top
+    python klipbench.py --startup 200
+
+Every script in transforms, custom and ~/.KlipChop/custom is run against
+every dataset (see DATASETS, csvN is a CSV of N columns) at each size.  The
+wall time of a run is reported, followed by the peak traced memory of a
+second run under tracemalloc.  Once a transform takes longer than the
+--budget seconds the larger sizes are skipped for it.
+
+After the runs each transform and dataset gets its scaling exponent, the
+slope of log(time) against log(lines) between the smallest and largest
+size, anything over SUPERLINEAR is flagged as a likely quadratic.
+
+--save writes the results as JSON.  --baseline compares against a saved
+run and flags any time or peak memory grown by more than --threshold,
+exiting with 1 if there were regressions.  Differences under NOISETIME
+seconds or NOISEBYTES are ignored.
+
+--clipboard runs through klipcore.runtransform and the in-memory clipboard
+instead, timing the clipboard read and write as well.  --engine picks the
+engine it runs on (see klipexec.py), auto is the one the tray would choose.
+
+The excel dataset is the tab separated text of a copy from Excel, its runs
+also get the Csv and HTML Format payloads Excel puts on the clipboard with
+it (see excelformats), so cells transforms read the cells.
+
+-c sets a config option for the runs as klipchop run -s does, eg. to
+compare a transform's modes.
+
+--startup builds a custom menu of that many generated scripts and times
+reading the menu metadata (what the tray does before showing the icon)
+against importing every script up front.
+"""
+
+import io
+import sys
+import csv
+import html
+import json
+import yaml
+import math
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+from pathlib import Path
+
+import klipcore
+import klipexec
+import klipboard
+from klipcore import config
+
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+SUPERLINEAR = 1.5       # scaling exponent flagged as a likely quadratic
+NOISETIME = 0.05        # seconds difference never reported as a regression
+NOISEBYTES = 1 << 20    # nor this much peak memory
+MINTIME = 0.002         # runs quicker than this are too noisy to scale from
+BASELINEVERSION = 1
+
+ENGINES = {
+    'inline': klipcore.inlineengine,
+    'stream': klipcore.streamengine,
+    'parallel': klipexec.parallelengine,
+    'auto': klipexec.scheduledengine,
+}
+
+
+# Datasets, each a generator of count lines:
+
+def syntheticlines(count, seed=1):
+    """ Mixed storage admin looking text with plenty of repeats """
+    rnd = random.Random(seed)
+    distinct = max(count // 4, 1)
+    for i in range(count):
+        n = rnd.randrange(distinct)
+        yield (f'  CL{n % 8 + 1}-{"ABCDEFGH"[n % 8]} , LDEV 00:{n >> 8 & 0xff:02X}:{n & 0xff:02X}'
+               f' , 50060e80{n:08x} , {n * 1.5:.2f} , {n}  ')
+
+
+def ldevlines(count, seed=1):
+    """ LDEV ids in the forms raidcom, HDvM and spreadsheets show them """
+    rnd = random.Random(seed)
+    distinct = max(count // 2, 1)
+    for i in range(count):
+        n = rnd.randrange(distinct) & 0xffff
+        cu, ldev = n >> 8, n & 0xff
+        form = i % 4
+        if form == 0:
+            yield f'00:{cu:02X}:{ldev:02X}'
+        elif form == 1:
+            yield f'{cu:02X}:{ldev:02X}'
+        elif form == 2:
+            yield f'LDEV#{n:04X}  Size {rnd.randrange(1, 4096)}GB'
+        else:
+            yield f'{n:04x}'
+
+
+VENDORS = [ ('Hitachi', 'HUS VM', '50060e80'), ('Hitachi', 'VSP G900', '50060e80'),
+    ('HPE', '3PAR 8400', '20210002'), ('NetApp', 'AFF A400', '500a0980'), ('Pure', 'FA-X70', '524a9370') ]
+
+def wwnlines(count, seed=1):
+    """ Tab separated WWN dump shaped like wwntest.txt """
+    rnd = random.Random(seed)
+    yield 'Enter WWN here: (no trailing spaces)\tVendor\tModel\tSerial #\tPort'
+    for i in range(count - 1):
+        vendor, model, prefix = VENDORS[rnd.randrange(len(VENDORS))]
+        serial = rnd.randrange(10000, 999999)
+        wwn = f'{prefix}{serial & 0xffffff:06x}{rnd.randrange(256):02x}'
+        if i % 2:
+            wwn = wwn.upper()
+        yield f'{wwn}\t{vendor}\t{model}\t{serial}\t{rnd.randrange(8)}{"ABCDEFGH"[rnd.randrange(8)]}'
+
+
+def tablelines(count, seed=1):
+    """ ASCII framed table with a ruled header and a rule every 50 rows """
+    rnd = random.Random(seed)
+    widths = (6, 10, 18, 8, 12)
+    rule = '+' + '+'.join('-' * (w + 2) for w in widths) + '+'
+
+    def row(cells):
+        return '|' + '|'.join(f' {c:<{w}} ' for c, w in zip(cells, widths)) + '|'
+    yield rule
+    yield row(('Port', 'LDEV', 'WWN', 'Size', 'Pool'))
+    yield rule.replace('-', '=')
+    lines = 3
+    while lines < count:
+        if lines % 50 == 0:
+            yield rule
+        else:
+            n = rnd.randrange(max(count // 4, 1))
+            yield row((f'CL{n % 8 + 1}-{"ABCDEFGH"[n % 8]}', f'00:{n >> 8 & 0xff:02X}:{n & 0xff:02X}',
+                f'50060e80{n:08x}', f'{rnd.randrange(1, 4096)}GB', f'Pool{n % 16}'))
+        lines += 1
+
+
+def csvlines(count, seed=1, columns=10):
+    """ CSV of the given number of columns under a header row """
+    rnd = random.Random(seed)
+    yield ','.join(f'col{c}' for c in range(columns))
+    distinct = max(count // 4, 1)
+    for i in range(count - 1):
+        n = rnd.randrange(distinct)
+        yield ','.join(str(n * (c + 1)) if c % 3 else f'value{n + c}' for c in range(columns))
+
+
+def numericlines(count, seed=1):
+    """ Free text with decimal, float and 0x hex numbers mixed through it """
+    rnd = random.Random(seed)
+    for i in range(count):
+        yield (f'Pool {rnd.randrange(64)} used {rnd.random() * 1000:.2f} GB of {rnd.randrange(1, 100000)}'
+               f' at 0x{rnd.randrange(1 << 32):x}, {rnd.randrange(1000)} snaps')
+
+
+def baselines(count, seed=1):
+    """ Six numbers a line in the bases dec2hex and hex2dec convert between """
+    rnd = random.Random(seed)
+    for i in range(count):
+        n = rnd.randrange(1 << 32)
+        wwn = ':'.join(f'{x:02x}' for x in (0x50, 0x06, 0x0e, 0x80, n >> 24, n >> 16 & 0xff, n >> 8 & 0xff, n & 0xff))
+        yield f'LDEV {n & 0xffff} size {n} at 0x{n:x} id {n:x}a wwn {wwn} mask 0b{n & 0xff:b}'
+
+
+def excellines(count, seed=1):
+    """ Text of an Excel copy, tab separated with a quoted cell wherever a comment has a line end """
+    rnd = random.Random(seed)
+    yield 'Port\tLDEV\tPool\tCapacity (GB)\tUsed %\tComment'
+    for i in range(count - 1):
+        n = rnd.randrange(max(count // 4, 1))
+        comment = '"migrated\nfrom G600"' if i % 97 == 0 else ('' if i % 3 else f'host{n % 50}')
+        yield (f'CL{n % 8 + 1}-{"ABCDEFGH"[n % 8]}\t00:{n >> 8 & 0xff:02X}:{n & 0xff:02X}\tPool{n % 16}'
+               f'\t{rnd.randrange(1, 4096)}\t{rnd.random() * 100:.1f}\t{comment}')
+
+
+DATASETS = {
+    'mixed': syntheticlines,
+    'ldev': ldevlines,
+    'wwn': wwnlines,
+    'table': tablelines,
+    'csv1': lambda count, seed=1: csvlines(count, seed, 1),
+    'csv10': lambda count, seed=1: csvlines(count, seed, 10),
+    'csv100': lambda count, seed=1: csvlines(count, seed, 100),
+    'numeric': numericlines,
+    'bases': baselines,
+    'excel': excellines,
+}
+
+
+# Excel payloads:
+
+EXCELHEAD = """<html xmlns:v="urn:schemas-microsoft-com:vml"\r
+xmlns:o="urn:schemas-microsoft-com:office:office"\r
+xmlns:x="urn:schemas-microsoft-com:office:excel"\r
+xmlns="http://www.w3.org/TR/REC-html40">\r
+\r
+<head>\r
+<meta http-equiv=Content-Type content="text/html; charset=utf-8">\r
+<meta name=ProgId content=Excel.Sheet>\r
+<meta name=Generator content="Microsoft Excel 15">\r
+<style>\r
+<!--table\r
+\t{mso-displayed-decimal-separator:"\\.";\r
+\tmso-displayed-thousand-separator:"\\,";}\r
+.xl65\r
+\t{white-space:normal;}\r
+-->\r
+</style>\r
+</head>\r
+\r
+<body link="#0563C1" vlink="#954F72">\r
+\r
+<table border=0 cellpadding=0 cellspacing=0 width=384 style='border-collapse:\r
+ collapse;width:288pt'>\r
+"""
+EXCELTAIL = """</table>\r
+\r
+</body>\r
+\r
+</html>\r
+"""
+
+
+def cfhtml(fragment, head=EXCELHEAD, tail=EXCELTAIL):
+    """ CF_HTML data of a fragment, the Version header's byte offsets worked out as Excel does """
+    header = 'Version:1.0\r\nStartHTML:{:010d}\r\nEndHTML:{:010d}\r\nStartFragment:{:010d}\r\nEndFragment:{:010d}\r\n'
+    before = (head + '<!--StartFragment-->').encode('utf-8')
+    body = fragment.encode('utf-8')
+    after = ('<!--EndFragment-->\r\n' + tail).encode('utf-8')
+    start = len(header.format(0, 0, 0, 0))
+    offsets = (start, start + len(before) + len(body) + len(after), start + len(before), start + len(before) + len(body))
+    return header.format(*offsets).encode('ascii') + before + body + after + b'\0'
+
+
+SAMECELLBR = "<br style='mso-data-placement:same-cell;' />"
+
+
+def htmlrow(cells):
+    """ A <tr> as Excel writes it, a line end in a cell a same-cell <br> """
+    tds = ''.join('  <td class=xl65>' + html.escape(x, False).replace('\n', SAMECELLBR) + '</td>\r\n' for x in cells)
+    return f" <tr height=20 style='height:15.0pt'>\r\n{tds} </tr>\r\n"
+
+
+def excelformats(text):
+    """ The Csv and HTML Format payloads Excel puts on the clipboard with the tab separated text """
+    rows = list(csv.reader(io.StringIO(text, newline=''), delimiter='\t'))
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\r\n').writerows(rows)
+    fragment = "\r\n <col width=64 span={} style='width:48pt'>\r\n".format(max(map(len, rows), default=1))
+    return {
+        'Csv': buffer.getvalue().encode('cp1252', 'replace') + b'\0',
+        'HTML Format': cfhtml(fragment + ''.join(map(htmlrow, rows))),
+    }
+
+
+def dataset(name):
+    """ Line generator of a dataset, csvN for any N columns """
+    if name in DATASETS:
+        return DATASETS[name]
+    if name.startswith('csv') and name[3:].isdigit():
+        return lambda count, seed=1: csvlines(count, seed, int(name[3:]))
+    raise KeyError(f'Unknown dataset {name}, choose from {", ".join(DATASETS)} or csvN')
+
+
+def payload(count, seed=1, name='mixed'):
+    return '\r\n'.join(dataset(name)(count, seed))
+
+
+# Running:
+
+def messages():
+    """ Collecting message function """
+    collected = list()
+    return collected, collected.append
+
+
+def outputsize(result):
+    """ Characters in a transform result, whichever form it came in """
+    if result is None:
+        return 0
+    if isinstance(result, str):
+        return len(result)
+    if isinstance(result, list):
+        return sum(map(len, result)) + max(len(result) - 1, 0)
+    return sum(map(len, result))
+
+
+def callmain(module, text, formats=None):
+    """ Call main() directly on the text (and the cells of any formats), returns the output size """
+    _, messagefunc = messages()
+    cells = klipboard.payloadcells(formats) if formats and 'cells' in klipcore.capabilities(module) else None
+    return outputsize(module.main(klipcore.textreader(text, cells=cells), messagefunc, dict(config)))
+
+
+def callclipboard(module, text, formats=None, engine=klipcore.inlineengine):
+    """ Run through klipcore.runtransform and the in-memory clipboard """
+    klipcore.backend = klipboard.MemoryBackend(text, formats)
+    _, messagefunc = messages()
+    klipcore.runtransform(module, messagefunc, None, engine)
+    output = klipcore.backend.get_text()
+    return len(output) if output else 0
+
+
+def runone(module, text, trace=False, call=callmain, formats=None):
+    """ Run a transform once, returns (seconds, peakbytes, outputchars) """
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        outchars = call(module, text, formats)
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return elapsed, peak, outchars
+
+
+def transforms(names=None):
+    """ (name, filename) of every script in the transform directories, optionally filtered by name """
+    klipcore.loadmenus(readonly=True)   # registers the menu $options the scripts read
+    found = list()
+    for dirname in (klipcore.progdir / 'transforms', klipcore.progdir / 'custom', klipcore.configdir / 'custom'):
+        for filename in sorted(dirname.glob('*.py')):
+            name = filename.stem
+            if names and name not in names: continue
+            found.append((name, str(filename)))
+    return found
+
+
+# Scaling and baselines:
+
+def scaling(results):
+    """ {(transform, dataset): exponent} from the smallest to the largest timed size """
+    runs = dict()
+    for r in results:
+        runs.setdefault((r['transform'], r['dataset']), []).append(r)
+    exponents = dict()
+    for key, rows in runs.items():
+        rows = sorted((r for r in rows if r['seconds'] >= MINTIME), key=lambda r: r['lines'])
+        if len(rows) < 2 or rows[-1]['lines'] == rows[0]['lines']:
+            continue
+        first, last = rows[0], rows[-1]
+        exponents[key] = math.log(last['seconds'] / first['seconds']) / math.log(last['lines'] / first['lines'])
+    return exponents
+
+
+def runkey(r):
+    return f'{r["transform"]}/{r["dataset"]}/{r["lines"]}'
+
+
+def savebaseline(path, results, mode, settings):
+    data = {
+        'version': BASELINEVERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'mode': mode,
+        'config': settings,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as fd:
+        json.dump(data, fd, indent=1)
+
+
+def regressions(baseline, results, threshold):
+    """ Lines describing each run slower or larger than the baseline by more than threshold """
+    base = { runkey(r): r for r in baseline['results'] }
+    found = list()
+    for r in results:
+        b = base.get(runkey(r))
+        if b is None:
+            continue
+        if r['seconds'] > b['seconds'] * (1 + threshold) and r['seconds'] - b['seconds'] > NOISETIME:
+            found.append(f'{runkey(r)}: {b["seconds"]:.3f}s -> {r["seconds"]:.3f}s')
+        if b['peakbytes'] and r['peakbytes'] > b['peakbytes'] * (1 + threshold) and r['peakbytes'] - b['peakbytes'] > NOISEBYTES:
+            found.append(f'{runkey(r)}: peak {b["peakbytes"] / 2**20:.1f}MB -> {r["peakbytes"] / 2**20:.1f}MB')
+    return found
+
+
+STARTUPSCRIPT = """
+import re
+import json
+import decimal
+PATTERNS = [ re.compile(str(i) + r'[\\dA-F]{15}(?![\\dA-Z])', re.IGNORECASE) for i in range(20) ]
+
+def main(textlines, messagefunc, config):
+    return list(textlines())
+"""
+
+
+def startupbench(count):
+    """ Time building the menu from metadata against importing every script """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        with open(tmpdir / 'menu.config', 'w') as fd:
+            for i in range(count):
+                (tmpdir / f'script{i}.py').write_text(STARTUPSCRIPT)
+                fd.write(f'script{i}.py : Generated script {i}\n')
+                if i % 10 == 9:
+                    fd.write('---\n')
+
+        start = time.perf_counter()
+        menu = klipcore.readmenuconfig(tmpdir / 'menu.config')
+        metadata = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for filename, description in menu:
+            if description is not None:
+                klipcore.loadmodule(filename)
+        eager = time.perf_counter() - start
+
+    print(f'{count} custom scripts: menu metadata {metadata:.3f}s, importing all {eager:.3f}s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark KlipChop transforms against generated datasets.')
+    parser.add_argument('-s', '--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+        help='comma separated payload line counts, up to 10000000 (default %(default)s)')
+    parser.add_argument('-t', '--transforms', help='comma separated script names (default all)')
+    parser.add_argument('-d', '--datasets', default=','.join(DATASETS),
+        help='comma separated datasets, csvN for N columns (default %(default)s)')
+    parser.add_argument('-b', '--budget', type=float, default=30.0,
+        help='skip larger sizes once a run takes longer than this many seconds')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc peak memory run')
+    parser.add_argument('--clipboard', action='store_true',
+        help='run through runtransform and the in-memory clipboard rather than calling main()')
+    parser.add_argument('-e', '--engine', choices=ENGINES,
+        help='engine to run on, implies --clipboard (default inline)')
+    parser.add_argument('-c', '--config', action='append', default=[], metavar='NAME=VALUE',
+        help='set a config option for the runs, may be repeated')
+    parser.add_argument('--save', metavar='JSON', help='write the results as a baseline')
+    parser.add_argument('--baseline', metavar='JSON', help='flag regressions against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+        help='fraction a run may grow over the baseline before it is flagged (default %(default)s)')
+    parser.add_argument('--startup', type=int, metavar='COUNT',
+        help='time the tray menu build for COUNT generated custom scripts instead')
+    args = parser.parse_args(argv)
+
+    klipcore.setup()
+    config['cache-size'] = 0   # every run must do the work
+    settings = dict()
+    for option in args.config:
+        name, sep, value = option.partition('=')
+        if not sep:
+            parser.error(f'--config needs NAME=VALUE not: {option}')
+        settings[name.strip()] = yaml.safe_load(value)
+    if args.startup:
+        startupbench(args.startup)
+        return 0
+    sizes = sorted(int(x) for x in args.sizes.split(','))
+    names = args.transforms.split(',') if args.transforms else None
+    try:
+        datasets = [ (x, dataset(x)) for x in args.datasets.split(',') ]
+    except KeyError as exc:
+        parser.error(exc.args[0])
+    config.update(settings)
+    call = callmain
+    if args.clipboard or args.engine:
+        engine = ENGINES[args.engine or 'inline']
+        call = lambda module, text, formats: callclipboard(module, text, formats, engine)
+    results = list()
+
+    print(f'{"transform":<16}{"dataset":<10}{"lines":>12}{"seconds":>12}{"lines/s":>14}{"peak MB":>10}{"out chars":>14}')
+    for name, filename in transforms(names):
+        try:
+            module = klipcore.loadmodule(filename)
+        except Exception as exc:
+            print(f'{name:<16}  not loaded: {exc!r}')
+            continue
+        for dataname, generator in datasets:
+            for size in sizes:
+                text = '\r\n'.join(generator(size))
+                formats = excelformats(text) if dataname == 'excel' else None
+                try:
+                    elapsed, _, outchars = runone(module, text, call=call, formats=formats)
+                    peak = 0 if args.no_memory else runone(module, text, True, call, formats)[1]
+                except Exception as exc:
+                    print(f'{name:<16}{dataname:<10}{size:>12,d}  failed: {exc!r}')
+                    break
+                finally:
+                    del text, formats
+                results.append({ 'transform': name, 'dataset': dataname, 'lines': size,
+                    'seconds': elapsed, 'peakbytes': peak, 'outchars': outchars })
+                print(f'{name:<16}{dataname:<10}{size:>12,d}{elapsed:>12.3f}{size / elapsed if elapsed else 0:>14,.0f}'
+                      f'{peak / 2**20:>10.1f}{outchars:>14,d}')
+                sys.stdout.flush()
+                if elapsed > args.budget:
+                    print(f'{name:<16}{dataname:<10}  over {args.budget}s budget, larger sizes skipped')
+                    break
+
+    exponents = scaling(results)
+    if exponents:
+        print('\nScaling exponent of time against lines (1 is linear):')
+        for (name, dataname), exponent in sorted(exponents.items()):
+            flag = '  <-- superlinear' if exponent > SUPERLINEAR else ''
+            print(f'{name:<16}{dataname:<10}{exponent:>6.2f}{flag}')
+
+    mode = f'clipboard {args.engine or "inline"}' if args.clipboard or args.engine else 'main'
+    if args.save:
+        savebaseline(args.save, results, mode, settings)
+        print(f'\nBaseline saved to {args.save}')
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as fd:
+            baseline = json.load(fd)
+        if baseline.get('mode', mode) != mode:
+            print(f'\nWarning: baseline was run in {baseline["mode"]} mode, comparing anyway')
+        found = regressions(baseline, results, args.threshold)
+        if found:
+            print(f'\n{len(found)} regressions over {args.threshold:.0%}:')
+            for line in found:
+                print('  ' + line)
+            return 1
+        print(f'\nNo regressions over {args.threshold:.0%} against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,525 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipboard.py - Clipboard backends for KlipChop.
+
+"""
+klipboard.py  - Where the clipboard text comes from and goes to.
+
+Win32Backend is the real clipboard, FileBackend reads and writes plain files
+or pipes and MemoryBackend is an in-memory stand-in used by the benchmark
+harness (klipbench.py) so the transforms can be driven on any platform.
+
+Transform results reach a backend as a TextResult, the pieces the transform
+returned without joining them into one string first.  Win32Backend copies
+them straight into a global memory block of the final size.  With delayed
+set the text is only produced when something pastes it, a result of more
+than spillchars waits in a temporary file until then.
+
+A copy from Excel also puts the cells on the clipboard in registered
+formats, get_cells() gives them as rows of cells (see payloadcells) so
+transforms reading textlines('cells') skip parsing the text.  "Csv" is read
+through the csv module, "HTML Format" (CF_HTML) when the Csv holds a ? the
+ANSI code page may have put there for a character it doesn't have.
+"""
+
+import re
+import io
+import sys
+import csv
+import html
+import tempfile
+import threading
+
+
+
+BLOCKSIZE = 1 << 20   # characters handed over at a time
+ASTRAL = re.compile('[\U00010000-\U0010ffff]')   # two UTF-16 units each
+CELLFORMATS = ('Csv', 'HTML Format')   # registered clipboard formats read by get_cells()
+ANSI = 'mbcs' if sys.platform == 'win32' else 'cp1252'   # what Excel's Csv is in
+HTMLOFFSET = re.compile(rb'^(StartHTML|EndHTML|StartFragment|EndFragment):(-?\d+)\r?$', re.MULTILINE)
+HTMLROW = re.compile(r'<tr\b', re.IGNORECASE)
+HTMLCELL = re.compile(r'<t[dh]\b([^>]*)>(.*?)</t[dh]\s*>', re.IGNORECASE | re.DOTALL)
+HTMLBREAK = re.compile(r'<br\b[^>]*>', re.IGNORECASE)
+HTMLTAG = re.compile(r'<[^>]*>')
+HTMLSPAN = re.compile(r'colspan\s*=\s*["\']?(\d+)', re.IGNORECASE)
+
+
+def chunks(result):
+    """
+    The pieces of a transform result: a str is one piece, a list is lines
+    with a newline between them and any other iterable is pieces already.
+    """
+    if result is None:
+        return
+    if isinstance(result, str):
+        yield result
+    elif isinstance(result, list):
+        for i, line in enumerate(result):
+            if i:
+                yield '\n'
+            yield line
+    else:
+        yield from result
+
+
+class TextResult:
+    """
+    A transform result held as the pieces it came in.  len() is its length
+    in characters, utf16size its length on the clipboard and newlines the
+    line breaks in it.  With spillchars, pieces past that many characters
+    go to a temporary file (removed once the result is dropped).  blocks()
+    gives the text BLOCKSIZE characters or so at a time and text() the
+    whole string.
+    """
+
+    def __init__(self, result, spillchars=None):
+        self.pieces = list()
+        self.size = 0
+        self.utf16size = 0
+        self.newlines = 0
+        self.spill = None
+        self.lock = threading.Lock()   # one reader of the spill file at a time
+        for piece in chunks(result):
+            self.size += len(piece)
+            self.utf16size += len(piece) if piece.isascii() else len(piece) + len(ASTRAL.findall(piece))
+            self.newlines += piece.count('\n')
+            if self.spill is not None:
+                self.spill.write(piece)
+                continue
+            self.pieces.append(piece)
+            if spillchars is not None and self.size > spillchars:
+                self.spill = tempfile.TemporaryFile('w+', encoding='utf-8', errors='surrogatepass', newline='')
+                self.spill.writelines(self.pieces)
+                self.pieces = None
+
+    def __len__(self):
+        return self.size
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + 2 * self.size
+
+    @property
+    def spilled(self):
+        return self.spill is not None
+
+    def blocks(self):
+        if self.spill is not None:
+            with self.lock:
+                self.spill.seek(0)
+                while block := self.spill.read(BLOCKSIZE):
+                    yield block
+            return
+        batch, size = list(), 0
+        for piece in self.pieces:
+            batch.append(piece)
+            size += len(piece)
+            if size >= BLOCKSIZE:
+                yield ''.join(batch)
+                batch, size = list(), 0
+        if batch:
+            yield ''.join(batch)
+
+    def text(self):
+        if self.spill is not None:
+            with self.lock:
+                self.spill.seek(0)
+                return self.spill.read()
+        if len(self.pieces) == 1:
+            return self.pieces[0]
+        return ''.join(self.pieces)
+
+
+def csvcells(data):
+    """ Rows of Excel's Csv format, ANSI text up to a NUL separated by the locale's list separator """
+    text = data.split(b'\0', 1)[0].decode(ANSI, 'replace')
+    try:
+        delimiter = csv.Sniffer().sniff(text[:4096], ',;\t').delimiter
+    except csv.Error:   # eg. a single column
+        delimiter = ','
+    return list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter))
+
+
+def htmlcells(data):
+    """
+    Rows of the <td> and <th> cells of CF_HTML's fragment (the markup Excel
+    writes, no nested tables), a cell's <br>s line ends and colspan padded out
+    """
+    offsets = { k.decode(): int(v) for k, v in HTMLOFFSET.findall(data[:512]) }
+    start, end = offsets.get('StartFragment', -1), offsets.get('EndFragment', -1)
+    if start < 0 or end < start:
+        start, end = max(offsets.get('StartHTML', 0), 0), offsets.get('EndHTML', len(data))
+    rows = list()
+    for row in HTMLROW.split(data[start:end].decode('utf-8', 'replace'))[1:]:
+        cells = list()
+        for attrs, content in HTMLCELL.findall(row):
+            # Whitespace runs as a browser shows them:
+            if '<' in content or '&' in content:
+                lines = HTMLTAG.sub('', HTMLBREAK.sub('\n', content)).split('\n')
+                cells.append('\n'.join(' '.join(html.unescape(x).split()) for x in lines))
+            else:
+                cells.append(' '.join(content.split()))
+            span = HTMLSPAN.search(attrs)
+            if span:
+                cells.extend([ '' ] * (int(span.group(1)) - 1))
+        rows.append(cells)
+    return rows
+
+
+def payloadcells(formats):
+    """
+    Rows of cells from a spreadsheet copy, formats a dict of registered
+    format name (CELLFORMATS) to its data.  None unless there is a Csv, text
+    from anywhere else is read as text.
+    """
+    csvdata = formats.get('Csv')
+    if not csvdata:
+        return None
+    if b'?' in csvdata and formats.get('HTML Format'):
+        rows = htmlcells(formats['HTML Format'])
+        if rows:
+            return rows
+    return csvcells(csvdata)
+
+
+class ClipboardBackend:
+    """ Base class, all backends deal in str for text """
+    name = None
+
+    def get_text(self):
+        """ Return the clipboard text or None if it isn't text """
+        raise NotImplementedError
+
+    def get_cells(self):
+        """ Rows of cells when the clipboard holds a spreadsheet copy, otherwise None """
+        return None
+
+    def set_text(self, text):
+        raise NotImplementedError
+
+    def set_result(self, result, delayed=False):
+        """ Put a TextResult on the clipboard, by default as one string """
+        self.set_text(result.text())
+
+    def messagebox(self, text, title):
+        print(f'{title}: {text}', file=sys.stderr)
+
+    def ask(self, prompt, title, default=''):
+        """ Text the user types in answer to prompt, None if cancelled or they can't be asked """
+        return None
+
+    def close(self):
+        pass
+
+
+class Win32Backend(ClipboardBackend):
+    name = 'win32'
+
+    GMEM_MOVEABLE = 0x0002
+    GMEM_ZEROINIT = 0x0040
+
+    def __init__(self):
+        # Imported here so other backends work without pywin32:
+        import ctypes
+        import win32clipboard
+        import win32ui
+        self.ctypes = ctypes
+        self.win32clipboard = win32clipboard
+        self.win32ui = win32ui
+        self.renderer = None
+
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GlobalAlloc.restype = ctypes.c_void_p
+        kernel32.GlobalAlloc.argtypes = (ctypes.c_uint, ctypes.c_size_t)
+        kernel32.GlobalLock.restype = ctypes.c_void_p
+        kernel32.GlobalLock.argtypes = (ctypes.c_void_p,)
+        kernel32.GlobalUnlock.argtypes = (ctypes.c_void_p,)
+        kernel32.GlobalFree.argtypes = (ctypes.c_void_p,)
+        self.kernel32 = kernel32
+
+    def get_text(self):
+        win32clipboard = self.win32clipboard
+        try:
+            win32clipboard.OpenClipboard()
+            data = win32clipboard.GetClipboardData(win32clipboard.CF_UNICODETEXT)
+            # Below helps with a bug in getting excel clipboard data
+            # See: https://stackoverflow.com/questions/66756315/using-win32clipboard-getclipboarddata-to-get-copied-excel-table-returns-chinese
+            # it's using the size of the memory structure to determine how many bytes are in it.
+            # However, the documentation for the clipboard formats states this:
+            # CF_TEXT: Text format. Each line ends with a carriage return/linefeed (CR-LF) combination. A null character signals the end of the data. Use this format for ANSI text.
+            # CF_UNICODETEXT: Unicode text format. Each line ends with a carriage return/linefeed (CR-LF) combination. A null character signals the end of the data.
+            end = data.find('\x00')   # one scan, the padding can be most of the block
+            if end >= 0:
+                data = data[:end]
+        except TypeError as exc:
+            print(exc)
+            return None # it's not text so ignore
+        finally:
+            win32clipboard.CloseClipboard()
+        return data
+
+    def get_cells(self):
+        win32clipboard = self.win32clipboard
+        formats = dict()
+        try:
+            win32clipboard.OpenClipboard()
+            for name in CELLFORMATS:
+                fmt = win32clipboard.RegisterClipboardFormat(name)   # the id it already has
+                if win32clipboard.IsClipboardFormatAvailable(fmt):
+                    formats[name] = win32clipboard.GetClipboardData(fmt)   # bytes
+        except TypeError as exc:
+            print(exc)
+            return None
+        finally:
+            win32clipboard.CloseClipboard()
+        return payloadcells(formats)
+
+    def set_text(self, text):
+        win32clipboard = self.win32clipboard
+        try:
+            win32clipboard.OpenClipboard()
+            win32clipboard.EmptyClipboard()
+            win32clipboard.SetClipboardText(text)
+        except TypeError as exc:
+            print(exc)
+            return # it's not text so ignore
+        finally:
+            win32clipboard.CloseClipboard()
+
+    def globaltext(self, result):
+        """ Copy a TextResult a block at a time into a new global memory block sized for it """
+        kernel32 = self.kernel32
+        handle = kernel32.GlobalAlloc(self.GMEM_MOVEABLE | self.GMEM_ZEROINIT, (result.utf16size + 1) * 2)
+        if not handle:
+            raise MemoryError(f'No memory for a {len(result):,d} character clipboard result')
+        try:
+            pointer = kernel32.GlobalLock(handle)
+            try:
+                offset = 0
+                for block in result.blocks():
+                    data = block.encode('utf-16-le', 'surrogatepass')
+                    self.ctypes.memmove(pointer + offset, data, len(data))
+                    offset += len(data)
+            finally:
+                kernel32.GlobalUnlock(handle)
+        except BaseException:
+            kernel32.GlobalFree(handle)
+            raise
+        return handle
+
+    def set_result(self, result, delayed=False):
+        if delayed:
+            if self.renderer is None:
+                self.renderer = RenderWindow(self)
+                self.renderer.start()
+            self.renderer.offer(result)
+            return
+        win32clipboard = self.win32clipboard
+        handle = self.globaltext(result)
+        try:
+            win32clipboard.OpenClipboard()
+            try:
+                win32clipboard.EmptyClipboard()
+                win32clipboard.SetClipboardData(win32clipboard.CF_UNICODETEXT, handle)
+            finally:
+                win32clipboard.CloseClipboard()
+        except BaseException:   # the clipboard only owns the block once set
+            self.kernel32.GlobalFree(handle)
+            raise
+
+    def messagebox(self, text, title):
+        self.win32ui.MessageBox(text, title)
+
+    def ask(self, prompt, title, default=''):
+        import tkinter
+        from tkinter import simpledialog
+
+        root = tkinter.Tk()
+        root.withdraw()
+        root.attributes('-topmost', True)   # the tray has no window to come up in front of
+        try:
+            return simpledialog.askstring(title, prompt, initialvalue=default, parent=root)
+        finally:
+            root.destroy()
+
+    def close(self):
+        if self.renderer is not None:
+            self.renderer.close()
+
+
+class RenderWindow(threading.Thread):
+    """
+    Hidden window owning the clipboard for delayed rendering.  offer() puts
+    a promise of text on the clipboard, Windows sends WM_RENDERFORMAT the
+    first time something pastes it or WM_RENDERALLFORMATS if the window
+    closes first, when the text is copied in with Win32Backend.globaltext().
+    """
+
+    def __init__(self, backend):
+        super().__init__(name='clipboard', daemon=True)
+        self.backend = backend
+        self.result = None
+        self.hwnd = None
+        self.ready = threading.Event()
+
+    def run(self):
+        import win32api
+        import win32con
+        import win32gui
+        self.win32gui = win32gui
+        wc = win32gui.WNDCLASS()
+        wc.lpszClassName = 'KlipChopClipboard'
+        wc.hInstance = win32api.GetModuleHandle(None)
+        wc.lpfnWndProc = {
+            win32con.WM_RENDERFORMAT: self.onrender,
+            win32con.WM_RENDERALLFORMATS: self.onrenderall,
+            win32con.WM_DESTROYCLIPBOARD: self.ondestroyclipboard,
+            win32con.WM_DESTROY: self.ondestroy,
+        }
+        win32gui.RegisterClass(wc)
+        self.hwnd = win32gui.CreateWindow(wc.lpszClassName, 'KlipChop clipboard', 0, 0, 0, 0, 0,
+            win32con.HWND_MESSAGE, 0, wc.hInstance, None)
+        self.ready.set()
+        win32gui.PumpMessages()
+
+    def render(self):
+        result = self.result
+        if result is not None:
+            win32clipboard = self.backend.win32clipboard
+            win32clipboard.SetClipboardData(win32clipboard.CF_UNICODETEXT, self.backend.globaltext(result))
+
+    def onrender(self, hwnd, msg, wparam, lparam):
+        # The clipboard is already open for us here
+        self.render()
+        return 0
+
+    def onrenderall(self, hwnd, msg, wparam, lparam):
+        win32clipboard = self.backend.win32clipboard
+        win32clipboard.OpenClipboard(hwnd)
+        try:
+            if win32clipboard.GetClipboardOwner() == hwnd:
+                self.render()
+        finally:
+            win32clipboard.CloseClipboard()
+        return 0
+
+    def ondestroyclipboard(self, hwnd, msg, wparam, lparam):
+        # Someone else has the clipboard, the result is no longer wanted
+        self.result = None
+        return 0
+
+    def ondestroy(self, hwnd, msg, wparam, lparam):
+        self.win32gui.PostQuitMessage(0)
+        return 0
+
+    def offer(self, result):
+        self.ready.wait()
+        win32clipboard = self.backend.win32clipboard
+        win32clipboard.OpenClipboard(self.hwnd)
+        try:
+            win32clipboard.EmptyClipboard()   # drops any result we offered before
+            self.result = result
+            win32clipboard.SetClipboardData(win32clipboard.CF_UNICODETEXT, None)
+        finally:
+            win32clipboard.CloseClipboard()
+
+    def close(self):
+        """ Render what is still offered and end the window thread """
+        if self.hwnd is not None:
+            import win32con
+            self.win32gui.PostMessage(self.hwnd, win32con.WM_CLOSE, 0, 0)
+            self.join(5)
+
+
+class FileBackend(ClipboardBackend):
+    """ Plain files, None for either path means stdin/stdout """
+    name = 'file'
+
+    def __init__(self, inpath=None, outpath=None, encoding='utf-8'):
+        self.inpath = inpath
+        self.outpath = outpath
+        self.encoding = encoding
+
+    def get_text(self):
+        if self.inpath is None:
+            return sys.stdin.read()
+        with open(self.inpath, encoding=self.encoding, errors='replace') as fd:
+            return fd.read()
+
+    def set_text(self, text):
+        self.set_result(TextResult(text))
+
+    def set_result(self, result, delayed=False):
+        if self.outpath is None:
+            for block in result.blocks():
+                sys.stdout.write(block)
+            sys.stdout.flush()
+        else:
+            with open(self.outpath, 'w', encoding=self.encoding, newline='') as fd:
+                for block in result.blocks():
+                    fd.write(block)
+
+
+class MemoryBackend(ClipboardBackend):
+    """
+    In-memory clipboard, keeps message boxes for inspection and answers
+    ask() from the answers list.  formats holds the registered formats of a
+    spreadsheet copy alongside the text, eg. the payloads klipbench makes.
+    A delayed result is held in pending until get_text() (a paste) renders
+    it, renders counts how many were.
+    """
+    name = 'memory'
+
+    def __init__(self, text='', formats=None):
+        self.text = text
+        self.formats = dict(formats or {})
+        self.pending = None
+        self.renders = 0
+        self.messages = list()
+        self.answers = list()
+
+    def get_text(self):
+        if self.pending is not None:
+            self.text = self.pending.text()
+            self.pending = None
+            self.renders += 1
+        return self.text
+
+    def get_cells(self):
+        return payloadcells(self.formats)
+
+    def set_text(self, text):
+        self.text = text
+        self.formats = dict()
+        self.pending = None
+
+    def set_result(self, result, delayed=False):
+        if delayed:
+            self.text = None
+            self.formats = dict()
+            self.pending = result
+        else:
+            self.set_text(result.text())
+
+    def messagebox(self, text, title):
+        self.messages.append((title, text))
+
+    def ask(self, prompt, title, default=''):
+        self.messages.append((title, prompt))
+        return self.answers.pop(0) if self.answers else None
+
+
+backends = {
+    'win32': Win32Backend,
+    'file': FileBackend,
+    'memory': MemoryBackend,
+}
+
+
+def getbackend(name, *args, **kwargs):
+    """ Make a backend by name """
+    try:
+        backend = backends[name]
+    except KeyError:
+        raise ValueError(f'Unknown clipboard backend: {name}') from None
+    return backend(*args, **kwargs)   # its own errors, KeyError included, pass through
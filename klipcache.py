@@ -0,0 +1,128 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipcache.py - Result cache for repeated KlipChop transform runs.
+
+"""
+klipcache.py  - LRU cache of transform results.
+
+A result is keyed on a hash of the clipboard text (and the cells of a
+spreadsheet copy for a cells transform), the transform's filename and
+modification time (of every stage for a pipeline), and the values of the
+config keys the transform actually read while it ran (recorded by
+RecordingConfig).  Flipping an option the transform ignores still hits,
+flipping one it reads misses.  Entries are evicted oldest first once the
+cached results exceed maxbytes.
+
+Scripts declaring CACHEABLE = False (see klipcore.cacheable) are never
+cached, and their text is not hashed.
+"""
+
+import os
+import sys
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+
+class RecordingConfig(dict):
+    """ Copy of the config that remembers which keys were looked at """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.readkeys = set()
+
+    def __getitem__(self, key):
+        self.readkeys.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.readkeys.add(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        self.readkeys.add(key)
+        return super().__contains__(key)
+
+
+class ResultCache:
+
+    def __init__(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()   # (basekey, configitems): (text, messages, size)
+        self.variants = dict()         # basekey: [configitems, ...]
+        self.lock = threading.Lock()   # runs finish on worker threads
+
+    def basekey(self, text, filename, sourcefiles=None, cells=None):
+        """
+        Key for the text, cells and transform, sourcefiles are the scripts
+        behind a pipeline
+        """
+        digest = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16)
+        if cells is not None:   # the same text can come with different cells, eg. "1,024"
+            for row in cells:
+                digest.update(b'\0' + repr(row).encode('utf-8', 'surrogatepass'))
+        digest = digest.hexdigest()
+        mtimes = list()
+        for sourcefile in sourcefiles or (filename,):
+            try:
+                mtimes.append(os.path.getmtime(sourcefile))
+            except OSError:
+                mtimes.append(None)
+        return (digest, str(filename), tuple(mtimes))
+
+    def get(self, basekey, config):
+        """ Return (text, messages) of a matching result or None """
+        with self.lock:
+            return self._get(basekey, config)
+
+    def _get(self, basekey, config):
+        for configitems in self.variants.get(basekey, ()):
+            if all(config.get(k) == v for k, v in configitems):
+                key = (basekey, configitems)
+                self.entries.move_to_end(key)
+                self.hits += 1
+                text, messages, _ = self.entries[key]
+                return text, messages
+        self.misses += 1
+        return None
+
+    def put(self, basekey, readconfig, text, messages):
+        with self.lock:
+            self._put(basekey, readconfig, text, messages)
+
+    def _put(self, basekey, readconfig, text, messages):
+        configitems = tuple(sorted((k, readconfig.get(k)) for k in readconfig.readkeys))
+        size = sys.getsizeof(text)
+        if size > self.maxbytes:
+            return
+        key = (basekey, configitems)
+        if key in self.entries:
+            self.discard(key)
+        self.entries[key] = (text, list(messages), size)
+        self.variants.setdefault(basekey, []).append(configitems)
+        self.size += size
+        while self.size > self.maxbytes:
+            self.discard(next(iter(self.entries)))
+
+    def discard(self, key):
+        _, _, size = self.entries.pop(key)
+        self.size -= size
+        basekey, configitems = key
+        variants = self.variants[basekey]
+        variants.remove(configitems)
+        if not variants:
+            del self.variants[basekey]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.variants.clear()
+            self.size = 0
+
+    def __str__(self):
+        return f'{self.hits} hits, {self.misses} misses, {len(self.entries)} results, {self.size / 2**20:.1f} MB'
@@ -29,26 +29,29 @@
 KlipChop.py  - Tray app to assist with clipboard operations.
 """
 
-import importlib
 import sys
-import os
-import re
-import locale
-import importlib.util
-import traceback
+import time
+import multiprocessing
+
+starttime = time.perf_counter()   # startup is timed from here to the icon showing
+
+import klipcore
+from klipcore import config, configload, configsave, configflush, getprogdir
+
+if __name__ == '__main__' and sys.argv[1:2] == ['run']:
+    # Headless mode, keep clear of the clipboard and tray libraries:
+    import klipcli
+    sys.exit(klipcli.main(sys.argv[2:]))
 
-from typing import DefaultDict
 # from pystray import Icon as icon, Menu as menu,.MenuItem as.MenuItem
 from PIL import Image
 from pathlib import Path
-from io import StringIO
 
-import win32clipboard
-import win32ui
+import klipboard
+import klipexec
+import klipstats
 
 import pystray as st
-import yaml
-import texttable
 
 
 
@@ -62,23 +65,12 @@ __version__ = '1.0.0 20220510'
 
 # Setup later:
 progdir = None
-configdir = None
-configpath = None
-
-# Default config:
-config = {
-    'separator': ',',
-    'joiner': ' ',
-    'sort': True,
-    'hexprefix': True,
-    'overwrite': False,
-    'LDEV-ranges': True,
-}
+startupseconds = None
+runner = None
 
 # Generator functions to make callables for menu items:
 def toggle_bool(name):
     def inner(icon, item):
-        global config
         config[name] = not config[name]
         configsave()
     return inner
@@ -88,6 +80,34 @@ def get_bool(name):
         return config[name]
     return inner
 
+def set_choice(name, value):
+    def inner(icon, item):
+        config[name] = value
+        configsave()
+    return inner
+
+def is_choice(name, value):
+    def inner(item):
+        return config[name] == value
+    return inner
+
+def ask_text(name, description):
+    def inner(icon, item):
+        try:
+            value = klipcore.backend.ask(description, __appname__, str(config[name]))
+        except Exception as exc:   # a dialog that can't open mustn't take the tray thread down
+            klipcore.backend.messagebox(f'Could not ask for {description}:\n\n{exc!r}', __appname__)
+            return
+        if value is not None:
+            config[name] = value.strip()
+            configsave()
+    return inner
+
+def text_label(name, description):
+    def inner(item):
+        return f'{description}: {config[name]}'
+    return inner
+
 sepmenu = st.Menu(
     st.MenuItem('Comma ","', lambda: setsep(','), radio=True,
         checked=lambda _: current_sep(',')),
@@ -127,119 +147,20 @@ optmenuitems = [
     # st.MenuItem('Open custom script directory', action_customdir),
     st.MenuItem('Set default separator', sepmenu),
     st.MenuItem('Set default joiner', joinmenu),
-    st.MenuItem('Sort results', lambda: toggle_bool('sort'), checked=get_bool('sort')),
-    st.MenuItem('Prefix Hex with 0x', lambda: toggle_bool('hexprefix'), checked=get_bool('hexprefix')),
+    st.MenuItem('Sort results', toggle_bool('sort'), checked=get_bool('sort')),
+    st.MenuItem('Prefix Hex with 0x', toggle_bool('hexprefix'), checked=get_bool('hexprefix')),
+    st.MenuItem('Preload transforms in background', toggle_bool('preload'), checked=get_bool('preload')),
+    st.MenuItem('Copy results only when pasted', toggle_bool('delayed-render'), checked=get_bool('delayed-render')),
 ]
 
-# Global for the dynamically loaded modules:
+# Global for the menu descriptions to transform filenames, modules load on first use:
 moddict = dict()
 
+# Tray items of the menu.config entries, by (filename, description):
+menuentries = dict()
+transformitems = list()
+app = None
 
-# Config file handling
-def configload():
-    global config
-
-    with open(configpath, 'r') as fd:
-        newconfig = yaml.safe_load(fd)
-    config.update(newconfig)
-    return
-
-
-def configsave():
-    dirname = Path(configpath).parent
-    if not dirname.is_dir(): os.makedirs(dirname)
-    with open(configpath, 'w') as fd:
-        yaml.safe_dump(config, fd)
-
-
-def readmenuconfig(filename):
-    '''read a menuconfig from either the transform or custom directories'''
-    global config, optmenuitems
-
-    currentdir = Path(filename).absolute().parent
-    menu = list()
-    with open(filename) as fd:
-        for line in fd.readlines():
-            line = line.strip()
-            if not line or line.startswith('#'): continue
-            if line.startswith('@'): # include another menu
-                include = currentdir / line.strip('@')
-                if include.is_file():
-                    menu.extend(readmenuconfig(include))
-            elif line.startswith('$'): # add option to config
-                line = line.strip('$')
-                parts = [ i.strip() for i in line.split('=', 3) ]
-                if len(parts) == 4:
-                    (name, opttype, default, params) = parts
-                    if opttype == 'bool':
-                        config[name] = config.get(name, default)
-                        optmenuitems.append(st.MenuItem(params, toggle_bool(name), checked=get_bool(name)))
-            elif line.startswith('---'): # add a seperator
-                menu.append(('---', None))
-            else:
-                parts = [ x.strip() for x in line.split(':', 1) ]
-                if len(parts) == 2:
-                    name, description = parts
-                    fullpath = currentdir / name
-                    if fullpath.is_file():
-                        menu.append((str(fullpath), description))
-    return menu
-
-
-def get_clipboard_text():
-    try:
-        win32clipboard.OpenClipboard()
-        data = win32clipboard.GetClipboardData(win32clipboard.CF_UNICODETEXT)
-        # Below helps with a bug in getting excel clipboard data
-        # See: https://stackoverflow.com/questions/66756315/using-win32clipboard-getclipboarddata-to-get-copied-excel-table-returns-chinese
-        # it's using the size of the memory structure to determine how many bytes are in it.
-        # However, the documentation for the clipboard formats states this:
-        # CF_TEXT: Text format. Each line ends with a carriage return/linefeed (CR-LF) combination. A null character signals the end of the data. Use this format for ANSI text.
-        # CF_UNICODETEXT: Unicode text format. Each line ends with a carriage return/linefeed (CR-LF) combination. A null character signals the end of the data.
-        if '\x00' in data:
-            data = data[:data.find('\x00')]
-    except TypeError as exc:
-        print(exc)
-        return None # it's not text so ignore
-    finally:
-        win32clipboard.CloseClipboard()
-    return data
-
-
-def set_clipboard_text(text):
-    if isinstance(text, list):
-        text = '\n'.join(text)
-    try:
-        win32clipboard.OpenClipboard()
-        win32clipboard.EmptyClipboard()
-        win32clipboard.SetClipboardText(text)
-    except TypeError as exc:
-        print(exc)
-        return # it's not text so ignore
-    finally:
-        win32clipboard.CloseClipboard()
-
-
-def readdata(type=None):
-    # Only supports text (at the moment)
-    data = get_clipboard_text()
-    if type == 'rawtext':
-        yield data
-    else:   # defaults to yielding lines of stripped text:
-        for line in data.splitlines():
-            line = line.strip()   #.decode('utf-8', errors='ignore')
-            # if not line.isprintable():  # No longer needed as clipboard bug fixed above
-            #     continue
-            yield line
-
-    
-def action_setsort(icon, item):
-    config['sort'] = not config['sort']
-    configsave()
-
-def action_sethex(icon, item):
-    config['hexprefix'] = not config['hexprefix']
-    configsave()
 
 def setsep(separator):
     config['separator'] = separator
@@ -256,103 +177,166 @@ def current_join(joiner):
     return config['joiner'] == joiner
 
 def action_about(icon, item):
-    win32ui.MessageBox(f'''
+    klipcore.backend.messagebox(f'''
 Version: {__version__}
 
 Python:{sys.version}
 
 Progdir:{getprogdir()}
 
+Startup: {startupseconds or 0:.3f} seconds, {len(klipcore.modules)} of {len(moddict)} transforms loaded
+
+Result cache: {klipcore.cache or 'off'}
+
 Any ideas for repeated mundane clipboard tasks?
 Contact: {__email__}
 ''', __appname__)
 
 
 def action_exit(icon, item):
-    global config
-    configsave()
+    runner.shutdown()
+    klipcore.backend.close()   # renders a result still waiting to be pasted
+    configflush()
     icon.stop()
 
 
+def action_cancel(icon, item):
+    count = runner.cancel()
+    icon.notify(f'Cancelling {count} running transform{"s" if count != 1 else ""}')
+
+
 def runmodule(icon, item):
-    global config
+    runner.run(item.text, moddict[item.text])
 
-    # text = list(readdata())
-    try:
-        result = moddict[item.text].main(readdata, icon.notify, config)
-    except Exception as exc:
-            win32ui.MessageBox(f'Error running {item.text}:\n\n{traceback.format_exc()}\n', __appname__)
 
-    set_clipboard_text(result)
+def menuentry(filename, description):
+    """ Tray item for a menu.config entry """
+    moddict[description] = filename
+    return st.MenuItem(description, lambda icon, item: runmodule(icon, item))
 
 
-def getprogdir():
-    """ 
-    If the application is run as a bundle, the PyInstaller bootloader
-    extends the sys module by a flag frozen=True and sets the app 
-    path into variable _MEIPASS'.  Cx_freeze requires lookup of the sys.execuatable
-    PyInstaller Version 5.0 will change to __file__ as a full abspath. 
+def buildmenu(menudef):
+    """ Transform items for the menu, reusing the items of unchanged entries """
+    items = list()
+    for filename, description in menudef:
+        if filename.startswith('---'):
+            items.append(st.Menu.SEPARATOR)
+        else:
+            # Dynamic import is deferred to the first click:
+            key = (filename, description)
+            if key not in menuentries:
+                menuentries[key] = menuentry(filename, description)
+            items.append(menuentries[key])
+    return items
+
+
+def optionitems():
+    items = list(optmenuitems)
+    for name, opttype, default, params in klipcore.menuoptions:
+        if opttype == 'bool':
+            items.append(st.MenuItem(params, toggle_bool(name), checked=get_bool(name)))
+        elif opttype == 'choice':
+            description, values = klipcore.choices(params)
+            items.append(st.MenuItem(description, st.Menu(*[
+                st.MenuItem(x, set_choice(name, x), radio=True, checked=is_choice(name, x)) for x in values ])))
+        elif opttype == 'text':
+            items.append(st.MenuItem(text_label(name, params), ask_text(name, params)))
+    return items
+
+
+def fileschanged(changed):
+    """
+    Watcher callback: rebuild the entries of changed scripts and re-read the
+    menus.  Runs on the watcher thread, so the tray's lists are built in full
+    and swapped in with one assignment each, never changed in place.
     """
-    if getattr(sys, 'frozen', False):
-        return getattr(sys, '_MEIPASS', os.path.dirname(sys.executable))
-    else:
-        return os.path.dirname(os.path.abspath(sys.modules['__main__'].__file__))
+    global transformitems
+
+    for path in changed:
+        if not path.endswith('.py'): continue
+        path = str(Path(path).absolute())
+        klipcore.forget(path)
+        for key in list(menuentries):
+            filename, description = key
+            if path in klipcore.stagefiles(filename):
+                menuentries[key] = menuentry(filename, description)
+                if config['preload']:
+                    klipcore.warmup([filename])
+    transformitems = buildmenu(klipcore.loadmenus())   # loadmenus swaps in klipcore.menuoptions too
+    if app is not None:
+        app.update_menu()
+
+
+def statsitems():
+    """ Statistics submenu, one line per transform run so far """
+    recorder = klipcore.recorder
+    items = list()
+    for name, stats in sorted(recorder.transforms.items()):
+        items.append(st.MenuItem(f'{name}: {stats.summary()}', None, enabled=False))
+        items.append(st.MenuItem(f'    {stats.histogramtext()}', None, enabled=False))
+    if not items:
+        items.append(st.MenuItem('No transforms run yet', None, enabled=False))
+    items.extend([st.Menu.SEPARATOR,
+        st.MenuItem('Reset statistics', lambda icon, item: recorder.reset()),
+        ])
+    return items
 
 
 def trayapp(menudef):
 
-    global moddict
+    global runner, app, transformitems
     image = Image.open(progdir / f'{__appname__}.png')
 
-    optmenu = st.Menu(*optmenuitems)
-    
-    menuitems = list()
-    for filename, description in menudef:
-        if filename.startswith('---'):
-            menuitems.append(st.Menu.SEPARATOR)
-        else:
-            # Dynamic import
-            spec = importlib.util.spec_from_file_location('module.name', filename)
-            moddict[description] = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(moddict[description])
-            menuitems.append(st.MenuItem(description, lambda icon, item: runmodule(icon, item)))
-    menuitems.extend( [st.Menu.SEPARATOR,
+    optmenu = st.Menu(lambda: optionitems())
+    transformitems = buildmenu(menudef)
+    otheritems = [st.Menu.SEPARATOR,
+            st.MenuItem('Cancel running transform', action_cancel, enabled=lambda item: runner.running),
+            st.MenuItem('Statistics', st.Menu(lambda: statsitems())),
             st.MenuItem('Options', optmenu),
             st.MenuItem('About', action_about),
             st.MenuItem('Exit', action_exit),
-        ] )
+        ]
 
-    traymenu = st.Menu(*menuitems) 
+    # Built from the item lists on each update, so an entry can be replaced alone:
+    traymenu = st.Menu(lambda: transformitems + otheritems)
 
     app = st.Icon(__appname__, image, menu=traymenu)
-    return app.run()
+    runner = klipexec.TransformRunner(app.notify,
+        lambda text: klipcore.backend.messagebox(text, __appname__),
+        onchange=app.update_menu)
+    if config['watch']:
+        watcher = klipcore.Watcher([progdir / 'transforms', progdir / 'custom', klipcore.configdir / 'custom'],
+            fileschanged)
+        watcher.start()
+    return app.run(setup=trayready)
 
 
-def klipchop():
-    global progdir, configdir, configpath
+def trayready(icon):
+    """ Called once the tray icon is up """
+    global startupseconds
+
+    icon.visible = True
+    startupseconds = time.perf_counter() - starttime
+    if config['preload']:
+        klipcore.warmup(list(moddict.values()))
+        klipexec.warmpool()
 
-    progdir = Path(getprogdir())
 
-    configdir = Path.home() / f'.{__appname__}'
-    configpath = configdir / f'{__appname__}.yaml'
-    if configpath.exists():
+def klipchop():
+    global progdir
+
+    klipcore.setup(__appname__)
+    progdir = klipcore.progdir
+    if klipcore.configpath.exists():
         configload()
+    klipcore.backend = klipboard.getbackend(config['clipboard'])
+    klipcore.recorder = klipstats.Recorder(klipcore.configdir / 'stats.jsonl', config['stats-sample'])
 
-    menu = readmenuconfig(progdir / 'transforms' / 'menu.config')
-    devcustom = progdir / 'custom' / 'menu.config'
-    prodcustom = configdir / 'custom' / 'menu.config'
-    if devcustom.is_file():  # use dev custom directory in development mode only.
-        menu.extend(readmenuconfig(devcustom))
-    elif prodcustom.is_file():
-        menu.extend(readmenuconfig(prodcustom))
+    menu = klipcore.loadmenus()
 
     trayapp(menu)
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()   # cpu_bound transforms run in a child process
     klipchop()
-
-
-
-
-
@@ -0,0 +1,189 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipcli.py - Run KlipChop transforms over files or pipes instead of the clipboard.
+
+"""
+klipcli.py  - Headless transform runner.
+
+    klipchop run <transform> [files...] [-o output] [-s name=value ...]
+
+Input lines are read lazily from the files (or stdin) and the result is
+written out a piece at a time, so exports far too big for the clipboard can
+be processed, ending with a newline.  The config and menus are loaded from
+~/.KlipChop as the tray app loads them but nothing there is written back.
+"""
+
+import io
+import os
+import sys
+import argparse
+import tempfile
+
+from pathlib import Path
+
+import yaml
+
+import klipboard
+import klipcore
+from klipcore import config
+
+
+class StdinSpool:
+    """ Stdin lines, copied to a temp file on the first pass for any later ones """
+
+    def __init__(self, encoding):
+        self.stdin = io.TextIOWrapper(sys.stdin.buffer, encoding=encoding, errors='replace', newline='')
+        self.spool = None
+        self.complete = False
+
+    def tee(self):
+        for line in self.stdin:
+            self.spool.write(line)
+            yield line
+        self.complete = True
+
+    def lines(self):
+        if self.spool is None:
+            self.spool = tempfile.TemporaryFile('w+', encoding='utf-8', newline='')
+            return self.tee()
+        if not self.complete:   # an earlier pass stopped part way
+            for line in self.stdin:
+                self.spool.write(line)
+            self.complete = True
+        self.spool.seek(0)
+        return iter(self.spool)
+
+
+class FileLines:
+    """
+    Re-iterable lines of the input files, read lazily on every pass.
+    Stripped lines unless raw, len() costs a pass.
+    """
+
+    def __init__(self, files, encoding, spool, raw=False):
+        self.files = files
+        self.encoding = encoding
+        self.spool = spool
+        self.raw = raw
+        self.count = None
+
+    def rawlines(self):
+        for filename in self.files:
+            if filename == '-':
+                yield from self.spool.lines()
+            else:
+                with open(filename, encoding=self.encoding, errors='replace', newline='') as fd:
+                    yield from fd
+
+    def __iter__(self):
+        if self.raw:
+            return self.rawlines()
+        return map(str.strip, self.rawlines())
+
+    def __len__(self):
+        if self.count is None:
+            self.count = sum(1 for _ in self.rawlines())
+        return self.count
+
+
+def textreader(files, encoding='utf-8'):
+    """ Make a textlines() callable reading lazily from files or stdin """
+    files = files or ['-']
+    spool = StdinSpool(encoding)
+    lines = FileLines(files, encoding, spool)
+    rawlines = FileLines(files, encoding, spool, raw=True)
+
+    def textlines(type=None):
+        if type == 'cells':   # files are only text
+            return None
+        return rawlines if type == 'rawtext' else lines
+    return textlines
+
+
+def findtransform(name, menu):
+    """ Find a transform by path, script name or menu description """
+    if name.endswith('.py') and Path(name).is_file():
+        return str(Path(name).absolute())
+    wanted = name.lower()
+    for filename, description in menu:
+        if description is None: continue
+        if klipcore.menuname(filename).lower() == wanted or description.lower() == wanted:
+            return filename
+    # Scripts not on any menu:
+    for dirname in (klipcore.progdir / 'transforms', klipcore.progdir / 'custom', klipcore.configdir / 'custom'):
+        fullpath = dirname / f'{name}.py'
+        if fullpath.is_file():
+            return str(fullpath)
+    return None
+
+
+def message(text):
+    print(text.rstrip('\n'), file=sys.stderr)
+
+
+def endline(result):
+    """ The result's pieces with a newline added if it doesn't end with one """
+    last = ''
+    for chunk in klipboard.chunks(result):
+        if chunk:
+            last = chunk
+            yield chunk
+    if last and not last.endswith('\n'):
+        yield '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog=f'{klipcore.__appname__.lower()} run',
+        description='Run a KlipChop transform over files or stdin.')
+    parser.add_argument('transform', nargs='?', help='script name, menu description or path of the transform')
+    parser.add_argument('files', nargs='*', help='input files, "-" or none for stdin')
+    parser.add_argument('-o', '--output', help='output file (default stdout)')
+    parser.add_argument('-s', '--set', action='append', default=[], metavar='NAME=VALUE',
+        help='override a config option for this run (repeatable)')
+    parser.add_argument('-e', '--encoding', default='utf-8', help='input file encoding (default utf-8)')
+    parser.add_argument('-l', '--list', action='store_true', help='list the available transforms')
+    args = parser.parse_args(argv)
+
+    klipcore.setup()
+    if klipcore.configpath.exists():
+        klipcore.configload()
+    menu = klipcore.loadmenus(readonly=True)
+
+    if args.list:
+        for filename, description in menu:
+            if description is not None:
+                print(f'{klipcore.menuname(filename):<20} {description}')
+        return 0
+    if not args.transform:
+        parser.error('a transform is required')
+
+    for option in args.set:
+        name, sep, value = option.partition('=')
+        if not sep:
+            parser.error(f'--set needs NAME=VALUE not: {option}')
+        config[name.strip()] = yaml.safe_load(value)
+
+    filename = findtransform(args.transform, menu)
+    if not filename:
+        parser.error(f'unknown transform: {args.transform}')
+    module = klipcore.loadmodule(filename)
+
+    result = module.main(textreader(args.files, args.encoding), message, config)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as fd:
+            klipcore.writeresult(endline(result), fd)
+    else:
+        try:
+            klipcore.writeresult(endline(result), sys.stdout)
+            sys.stdout.flush()
+        except BrokenPipeError:   # eg. piped into head
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
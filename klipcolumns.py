@@ -0,0 +1,258 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipcolumns.py - Columnar tables for KlipChop transforms.
+
+"""
+klipcolumns.py  - A pasted table held a column at a time.
+
+load() parses the input once through klipcsv and keeps each column's cells
+in a list of its own.  A column's values are only worked out when a
+transform asks for them: ints if every non empty cell is an integer, floats
+(NaN for empty cells) if every one is a number, otherwise the text.  With
+NumPy installed numeric columns are int64/float64 arrays and sorting and
+aggregation run over the arrays, without it over plain lists.  Output always
+gives the cells as they were pasted, eg. 007 stays 007.
+
+Columns are picked with specs like "2", "1,3", "2-4" or "Pool,Size",
+1 based numbers or header names (any case).  The first line is taken as a
+header when none of its cells is a number and they are all different.
+
+    table = klipcolumns.load(textlines, config['separator'])
+    keep = table.select('Pool,Size')
+    return klipcsv.chunks(table.rows(keep), config['separator'])
+"""
+
+import gc
+import math
+
+from itertools import chain, islice
+
+import klipcsv
+
+try:
+    import numpy
+except ImportError:   # optional, plain lists do the same work
+    numpy = None
+
+
+BATCHROWS = 65536    # rows moved into the columns at a time
+AGGREGATES = ('count', 'sum', 'min', 'max', 'mean')
+
+
+class Table:
+    """ Columns of cells (str), names from the header or the column numbers """
+
+    def __init__(self, names, cells, header):
+        self.names = names
+        self.cells = cells
+        self.header = header
+        self.valuecache = dict()
+
+    def __len__(self):
+        return len(self.cells[0]) if self.cells else 0
+
+    def select(self, spec):
+        """ Column indexes of a spec, ValueError naming anything not found """
+        lower = [ x.lower() for x in self.names ]
+        indexes = list()
+        for part in (x.strip() for x in str(spec).split(',')):
+            if not part:
+                continue
+            if part.lower() in lower:
+                indexes.append(lower.index(part.lower()))
+                continue
+            first, sep, last = part.partition('-')
+            if first.isdigit() and (not sep or last.isdigit()):
+                first = int(first)
+                last = int(last) if sep else first
+                if 1 <= first <= last <= len(self.names):
+                    indexes.extend(range(first - 1, last))
+                    continue
+            raise ValueError(f'No column {part!r}, the columns are: {", ".join(self.names)}')
+        return indexes
+
+    def values(self, i):
+        """ Typed values of column i, see infer() """
+        if i not in self.valuecache:
+            self.valuecache[i] = infer(self.cells[i])
+        return self.valuecache[i]
+
+    def rows(self, indexes, order=None, header=True):
+        """
+        Generator of the rows (tuples) of the indexed columns' cells, in order
+        if given.  Rows are zipped a batch at a time from slices of the columns.
+        """
+        if header and self.header:
+            yield tuple(self.names[i] for i in indexes)
+        columns = [ self.cells[i] for i in indexes ]
+        for start in range(0, len(self), BATCHROWS):
+            if order is None:
+                batch = [ x[start:start + BATCHROWS] for x in columns ]
+            else:
+                rows = order[start:start + BATCHROWS]
+                batch = [ list(map(x.__getitem__, rows)) for x in columns ]
+            yield from zip(*batch)
+
+
+def isnumber(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def load(textlines, separator):
+    """ Table of the transform input, rows padded or cut to the first row's length """
+    collecting = gc.isenabled()
+    gc.disable()   # a list per row and none in a cycle, collections would only slow the parse
+    try:
+        return loadrows(textlines, separator)
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def loadrows(textlines, separator):
+    _, rows = klipcsv.rows(textlines, separator)
+    rows = klipcsv.notblank(rows)
+    first = next(rows, None)
+    if first is None:
+        return Table([], [], False)
+    width = len(first)
+    header = not any(map(isnumber, first)) and len(set(first)) == width
+    cells = [ list() for _ in range(width) ]
+    names = first if header else [ str(x + 1) for x in range(width) ]
+    if not header:
+        rows = chain([ first ], rows)
+    while batch := list(islice(rows, BATCHROWS)):
+        batch = [ x if len(x) == width else (x + [ '' ] * width)[:width] for x in batch ]
+        for column, values in zip(cells, zip(*batch)):
+            column.extend(values)
+    return Table(names, cells, header)
+
+
+def infer(cells):
+    """ ints, floats (NaN for empty) or the cells themselves, as arrays with NumPy """
+    try:
+        values = list(map(int, cells))
+        if numpy is not None:
+            try:
+                return numpy.array(values, dtype=numpy.int64)
+            except OverflowError:   # eg. decimal WWNs, kept as Python ints
+                pass
+        return values
+    except ValueError:
+        pass
+    try:
+        values = [ float(x) if x.strip() else math.nan for x in cells ]
+    except ValueError:
+        return cells
+    return numpy.array(values, dtype=numpy.float64) if numpy is not None else values
+
+
+def isnumeric(values):
+    return not (isinstance(values, list) and values and isinstance(values[0], str))
+
+
+def sortorder(table, keys):
+    """
+    Row order sorting the table by keys, (column index, descending) pairs
+    most significant first.  Each key is a stable sort, from the last key.
+    """
+    order = list(range(len(table)))
+    for i, descending in reversed(keys):
+        values = table.values(i)
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            order = numpy.asarray(order)
+            keyvalues = values[order]
+            order = order[numpy.argsort(-keyvalues if descending else keyvalues, kind='stable')]
+        else:
+            order = sorted(order, key=values.__getitem__, reverse=descending)
+    return list(order)
+
+
+def groupids(table, indexes):
+    """ (group id of each row, key tuple of each group) in order of first appearance """
+    groups = dict()
+    keys = zip(*[ table.cells[i] for i in indexes ])
+    ids = [ groups.setdefault(k, len(groups)) for k in keys ]
+    return ids, list(groups)
+
+
+def overflows(values):
+    """ True for an int64 array whose sum could go past int64 """
+    if numpy is None or not isinstance(values, numpy.ndarray) or values.dtype.kind != 'i' or not len(values):
+        return False
+    largest = max(abs(int(values.max())), abs(int(values.min())))
+    return largest * len(values) > numpy.iinfo(numpy.int64).max
+
+
+def aggregate(values, ids, count, how):
+    """
+    List of the how (see AGGREGATES) of values for each of count groups,
+    empty cells of a float column are left out
+    """
+    if how == 'count':
+        if numpy is not None:
+            return numpy.bincount(ids, minlength=count).tolist()
+        counts = [ 0 ] * count
+        for i in ids:
+            counts[i] += 1
+        return counts
+    if not isnumeric(values) and how in ('sum', 'mean'):
+        raise ValueError(f'Cannot {how} a column of text')
+    if how in ('sum', 'mean') and overflows(values):
+        values = values.tolist()   # Python ints stay exact
+
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        ids = numpy.asarray(ids)
+        if values.dtype.kind == 'f':
+            present = ~numpy.isnan(values)
+            ids, values = ids[present], values[present]
+        if how in ('sum', 'mean'):
+            if values.dtype.kind == 'i':
+                sums = numpy.zeros(count, dtype=numpy.int64)
+                numpy.add.at(sums, ids, values)
+            else:
+                sums = numpy.bincount(ids, weights=values, minlength=count)
+            if how == 'sum':
+                return sums.tolist()
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                return (sums / numpy.bincount(ids, minlength=count)).tolist()
+        if values.dtype.kind == 'i':
+            limits = numpy.iinfo(numpy.int64)
+            result = numpy.full(count, limits.max if how == 'min' else limits.min)
+        else:
+            result = numpy.full(count, numpy.inf if how == 'min' else -numpy.inf)
+        (numpy.minimum if how == 'min' else numpy.maximum).at(result, ids, values)
+        return result.tolist()
+
+    pairs = ((i, x) for i, x in zip(ids, values) if x == x)   # NaN != NaN
+    if how in ('sum', 'mean'):
+        sums = [ 0 ] * count
+        counts = [ 0 ] * count
+        for i, x in pairs:
+            sums[i] += x
+            counts[i] += 1
+        if how == 'sum':
+            return sums
+        return [ s / n if n else math.nan for s, n in zip(sums, counts) ]
+    results = [ None ] * count
+    for i, x in pairs:
+        if results[i] is None or (x < results[i] if how == 'min' else x > results[i]):
+            results[i] = x
+    return results
+
+
+def celltext(value):
+    """ Output text of an aggregate """
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if not math.isfinite(value):   # a group with only empty cells
+            return ''
+        if value.is_integer() and abs(value) < 2**53:
+            return str(int(value))
+    return str(value)
@@ -0,0 +1,752 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipcore.py - Config, menu and transform loading shared by the tray app and CLI.
+
+"""
+klipcore.py  - Parts of KlipChop that do not need the clipboard or the tray.
+
+Nothing in here may import win32clipboard, win32ui or pystray so that the
+transforms can be run headless (see klipcli.py).
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import traceback
+import importlib.util
+
+from itertools import islice
+from pathlib import Path
+
+import yaml
+
+import klipboard
+import klipcache
+import kliplines
+import klipstats
+
+
+__appname__ = 'KlipChop'
+
+# Setup later:
+progdir = None
+configdir = None
+configpath = None
+
+class ConfigStore(dict):
+    """
+    The config dict.  save() only marks it changed, a background timer writes
+    it out once no change has been made for delay seconds, so a burst of menu
+    toggles costs one write and never blocks the tray.  flush() writes any
+    pending change straight away (on exit).  Writes hold writelock from the
+    snapshot to the rename, so an older snapshot never lands over a newer one.
+
+    It is written to the path it was loaded from, setup() sets configpath
+    for a first run with no file yet.  Files are replaced atomically (temp
+    file + rename).  A JSON copy is kept beside the YAML and is what load()
+    reads while it is at least as new, the YAML stays the file to edit.
+    """
+
+    def __init__(self, defaults, delay=1.0, path=None):
+        super().__init__(defaults)
+        self.delay = delay
+        self.path = path
+        self.lock = threading.Lock()
+        self.writelock = threading.Lock()   # held through snapshot and write, save() never waits on it
+        self.timer = None
+        self.dirty = False
+
+    def load(self, path):
+        path = self.path = Path(path)
+        jsonpath = path.with_suffix('.json')
+        newconfig = None
+        try:
+            if jsonpath.stat().st_mtime >= path.stat().st_mtime:
+                with open(jsonpath, 'r', encoding='utf-8') as fd:
+                    newconfig = json.load(fd)
+        except (OSError, ValueError):
+            newconfig = None
+        if newconfig is None:
+            with open(path, 'r', encoding='utf-8') as fd:
+                newconfig = yaml.load(fd, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        if newconfig:
+            self.update(newconfig)
+
+    def save(self):
+        """ Write the config out shortly, restarting the wait if one is pending """
+        with self.lock:
+            self.dirty = True
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """ Write any pending change now, after a write already under way """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        with self.writelock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                self.dirty = False
+                snapshot = dict(self)
+            self.write(snapshot, self.path)
+
+    @staticmethod
+    def write(snapshot, path):
+        path = Path(path)
+        if not path.parent.is_dir(): os.makedirs(path.parent)
+        dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+        atomicwrite(path, lambda fd: yaml.dump(snapshot, fd, Dumper=dumper))
+        atomicwrite(path.with_suffix('.json'), lambda fd: json.dump(snapshot, fd, indent=1))
+
+
+def atomicwrite(path, writefunc):
+    """ Write a text file via a temp file in the same directory and a rename """
+    path = Path(path)
+    handle, tmpname = tempfile.mkstemp(prefix=f'.{path.name}.', dir=path.parent)
+    try:
+        with open(handle, 'w', encoding='utf-8') as fd:
+            writefunc(fd)
+        os.replace(tmpname, path)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+
+
+# Default config:
+config = ConfigStore({
+    'separator': ',',
+    'joiner': ' ',
+    'sort': True,
+    'hexprefix': True,
+    'overwrite': False,
+    'LDEV-ranges': True,
+    'count-top': 100,   # lines listed by uniquecount's top mode
+    'clipboard': 'win32',
+    'preload': False,
+    'cache-size': 64,   # MB of transform results kept, 0 to disable
+    'workers': 2,       # transforms that can run at once
+    'timeout': 0,       # seconds before a run is cancelled, 0 for no limit
+    'progress': 5,      # seconds between progress notifications
+    'watch': True,      # reload changed scripts and menus without a restart
+    'stats-sample': 10, # trace the memory of one run in this many, 0 never
+    'delayed-render': False,   # only produce a result's text when it is pasted
+    'spill-size': 64,   # MB above which a delayed result waits in a temporary file
+    'stream-lines': 10000,     # inputs from this many lines are streamed when the transform can be
+    'process-lines': 100000,   # and line independent ones are split over the process pool from here
+    'processes': 0,     # worker processes in the pool, 0 for one per CPU
+    'dedup-memory': 256,   # MB of distinct lines kept in memory before de-duplicating on disk
+})
+
+# Clipboard backend, one of klipboard.backends:
+backend = None
+
+# Options declared with $ lines in menu.config files:
+#   (name, type, default, description)
+menuoptions = list()
+
+# Results of earlier runs, see klipcache.py:
+cache = None
+
+# Run statistics, a klipstats.Recorder when wanted:
+recorder = None
+
+# Every file the menus were read from or refer to, with its mtime:
+menufiles = dict()
+MANIFESTVERSION = 1
+
+# Menu entries chaining scripts: pipe: a.py | b.py : description
+PIPEPREFIX = 'pipe:'
+
+# Transform modules imported so far, by filename:
+modules = dict()
+moduleslock = threading.RLock()   # pipelines load their stages while holding it
+
+
+def getprogdir():
+    """
+    If the application is run as a bundle, the PyInstaller bootloader
+    extends the sys module by a flag frozen=True and sets the app
+    path into variable _MEIPASS'.  Cx_freeze requires lookup of the sys.execuatable
+    PyInstaller Version 5.0 will change to __file__ as a full abspath.
+    """
+    if getattr(sys, 'frozen', False):
+        return getattr(sys, '_MEIPASS', os.path.dirname(sys.executable))
+    else:
+        return os.path.dirname(os.path.abspath(sys.modules['__main__'].__file__))
+
+
+def setup(appname=__appname__):
+    """ Locate the program and config directories """
+    global progdir, configdir, configpath
+
+    progdir = Path(getprogdir())
+    configdir = Path.home() / f'.{appname}'
+    configpath = configdir / f'{appname}.yaml'
+    config.path = configpath
+
+
+# Config file handling
+def configload():
+    config.load(configpath)
+
+
+def configsave():
+    """ Deferred save, see ConfigStore """
+    config.save()
+
+
+def configflush():
+    config.flush()
+
+
+def filemtime(path):
+    """ Modification time of a file, None if it isn't there """
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def addoption(name, opttype, default, params, options=None):
+    """
+    Register an option declared in a menu.config, params is the description
+    for a bool or text and "description: choice, choice, ..." for a choice.
+    It is added to options, menuoptions when not given.
+    """
+    if options is None:
+        options = menuoptions
+    if opttype == 'bool':
+        config[name] = config.get(name, default.lower() in ('true', 'yes', '1'))
+        options.append((name, opttype, default, params))
+    elif opttype in ('choice', 'text'):
+        config[name] = config.get(name, default)
+        options.append((name, opttype, default, params))
+
+
+def choices(params):
+    """ (description, [choice, ...]) of a choice option's params """
+    description, _, values = params.partition(':')
+    return description.strip(), [ x.strip() for x in values.split(',') if x.strip() ]
+
+
+def readmenuconfig(filename, options=None):
+    '''read a menuconfig from either the transform or custom directories'''
+
+    currentdir = Path(filename).absolute().parent
+    menufiles[str(filename)] = filemtime(filename)
+    menu = list()
+    with open(filename) as fd:
+        for line in fd.readlines():
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            if line.startswith('@'): # include another menu
+                include = currentdir / line.strip('@')
+                menufiles[str(include)] = filemtime(include)
+                if include.is_file():
+                    menu.extend(readmenuconfig(include, options))
+            elif line.startswith('$'): # add option to config
+                line = line.strip('$')
+                parts = [ i.strip() for i in line.split('=', 3) ]
+                if len(parts) == 4:
+                    addoption(*parts, options=options)
+            elif line.startswith('---'): # add a seperator
+                menu.append(('---', None))
+            elif line.startswith(PIPEPREFIX): # chain of scripts
+                parts = [ x.strip() for x in line[len(PIPEPREFIX):].split(':', 1) ]
+                if len(parts) == 2:
+                    stages, description = parts
+                    stages = [ findscript(currentdir, x.strip()) for x in stages.split('|') ]
+                    if all(stages):
+                        menu.append((PIPEPREFIX + '|'.join(stages), description))
+            else:
+                parts = [ x.strip() for x in line.split(':', 1) ]
+                if len(parts) == 2:
+                    name, description = parts
+                    fullpath = currentdir / name
+                    menufiles[str(fullpath)] = filemtime(fullpath)
+                    if fullpath.is_file():
+                        menu.append((str(fullpath), description))
+    return menu
+
+
+def parsemenus(options=None):
+    """ Read the stock menu followed by the dev or production custom menu """
+    stock = progdir / 'transforms' / 'menu.config'
+    devcustom = progdir / 'custom' / 'menu.config'
+    prodcustom = configdir / 'custom' / 'menu.config'
+    for path in (devcustom, prodcustom):   # which exist decides the custom menu
+        menufiles[str(path)] = filemtime(path)
+    menu = readmenuconfig(stock, options)
+    if devcustom.is_file():  # use dev custom directory in development mode only.
+        menu.extend(readmenuconfig(devcustom, options))
+    elif prodcustom.is_file():
+        menu.extend(readmenuconfig(prodcustom, options))
+    return menu
+
+
+def loadmenus(readonly=False):
+    """
+    The menu entries, from the compiled manifest while none of the menu.config
+    files or scripts it was built from have changed, else parsed afresh and
+    the manifest rewritten (unless readonly, for headless runs).  The options are gathered in a new list that
+    replaces menuoptions once complete, as the tray may be reading it.
+    """
+    global menuoptions
+    manifestpath = configdir / 'manifest.json'
+    options = list()
+    menufiles.clear()
+    try:
+        with open(manifestpath, 'r', encoding='utf-8') as fd:
+            manifest = json.load(fd)
+        if (manifest['version'] == MANIFESTVERSION and manifest['progdir'] == str(progdir)
+                and all(filemtime(path) == mtime for path, mtime in manifest['files'].items())):
+            menufiles.update(manifest['files'])
+            for option in manifest['options']:
+                addoption(*option, options=options)
+            menuoptions = options
+            return [ tuple(x) for x in manifest['menu'] ]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    menu = parsemenus(options)
+    menuoptions = options
+    manifest = {
+        'version': MANIFESTVERSION,
+        'progdir': str(progdir),
+        'files': menufiles,
+        'options': options,
+        'menu': menu,
+    }
+    if readonly:
+        return menu
+    try:
+        if not configdir.is_dir(): os.makedirs(configdir)
+        atomicwrite(manifestpath, lambda fd: json.dump(manifest, fd, indent=1))
+    except OSError as exc:
+        print(f'Menu manifest not saved: {exc}')
+    return menu
+
+
+def findscript(currentdir, name):
+    """ Script path for a pipeline stage, looking beside the menu.config then in transforms """
+    if not name.endswith('.py'):
+        name += '.py'
+    for dirname in (currentdir, progdir / 'transforms'):
+        fullpath = Path(dirname) / name
+        menufiles[str(fullpath)] = filemtime(fullpath)
+        if fullpath.is_file():
+            return str(fullpath)
+    return None
+
+
+def stagefiles(filename):
+    """ Scripts behind a menu entry, several for a pipeline """
+    if filename.startswith(PIPEPREFIX):
+        return filename[len(PIPEPREFIX):].split('|')
+    return [filename]
+
+
+def menuname(filename):
+    """ Short name of a menu entry, the script name or the chain of them """
+    return '|'.join(Path(x).stem for x in stagefiles(filename))
+
+
+def lines(result):
+    """ Make a textlines() callable over the result of a pipeline stage """
+    if result is None:
+        result = ''
+    elif not isinstance(result, (str, list)):
+        result = list(result)   # chunks, kept so later passes work
+        chunked = True
+    else:
+        chunked = False
+
+    def rawpieces():
+        if isinstance(result, str):
+            yield result
+        elif chunked:
+            yield from result
+        else:
+            for i, line in enumerate(result):
+                yield f'\n{line}' if i else line
+
+    def textlines(type=None):
+        if type == 'cells':   # a stage's result is text
+            return None
+        return rawpieces() if type == 'rawtext' else striplines()
+
+    def striplines():
+        if isinstance(result, list) and not chunked:
+            for line in result:
+                if '\n' in line or '\r' in line:
+                    for part in line.splitlines():
+                        yield part.strip()
+                else:
+                    yield line.strip()
+        else:
+            tail = ''
+            for piece in rawpieces():
+                for line in io.StringIO(tail + piece):
+                    tail = line
+                    if line.endswith('\n'):
+                        yield line.strip()
+                        tail = ''
+            if tail:
+                yield tail.strip()
+    return textlines
+
+
+class Pipeline:
+    """
+    Menu entry chaining scripts, each stage reads the previous stage's result
+    through a textlines() generator so nothing in between is joined up or
+    put on the clipboard.  Only the last stage's notifications are shown.
+    """
+
+    def __init__(self, filename):
+        self.__file__ = filename
+        self.stages = [ getmodule(x) for x in stagefiles(filename) ]
+        self.CAPABILITIES = set()
+        if any('cpu_bound' in capabilities(x) for x in self.stages):
+            self.CAPABILITIES.add('cpu_bound')
+        for capability in ('streaming', 'cells'):   # later stages read lines()
+            if capability in capabilities(self.stages[0]):
+                self.CAPABILITIES.add(capability)
+        self.CACHEABLE = all(map(cacheable, self.stages))
+
+    @property
+    def sourcefiles(self):
+        return [ x.__file__ for x in self.stages ]
+
+    def main(self, textlines, messagefunc, config):
+        result = None
+        for i, stage in enumerate(self.stages):
+            last = i == len(self.stages) - 1
+            result = stage.main(textlines, messagefunc if last else lambda message: None, config)
+            textlines = lines(result)
+        return result
+
+
+def loadmodule(filename):
+    """ Dynamic import of a transform script """
+    if filename.startswith(PIPEPREFIX):
+        return Pipeline(filename)
+    spec = importlib.util.spec_from_file_location('module.name', filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def getmodule(filename):
+    """ Import a transform the first time it is needed """
+    module = modules.get(filename)
+    if module is None:
+        with moduleslock:
+            module = modules.get(filename)
+            if module is None:
+                module = modules[filename] = loadmodule(filename)
+    return module
+
+
+def forget(filename):
+    """ Drop a changed script, and any pipeline using it, so the next use reloads it """
+    with moduleslock:
+        for key in list(modules):
+            if filename in stagefiles(key):
+                del modules[key]
+
+
+class Watcher(threading.Thread):
+    """
+    Polls directories for changed, new or deleted scripts and menu configs,
+    callback is given the set of paths that changed.
+    """
+
+    def __init__(self, dirnames, callback, interval=2.0):
+        super().__init__(name='watcher', daemon=True)
+        self.dirnames = dirnames
+        self.callback = callback
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def snapshot(self):
+        mtimes = dict()
+        for dirname in self.dirnames:
+            try:
+                with os.scandir(dirname) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(('.py', '.config')) and entry.is_file():
+                            mtimes[os.path.join(dirname, entry.name)] = entry.stat().st_mtime
+            except OSError:   # not there (yet)
+                continue
+        return mtimes
+
+    def run(self):
+        previous = self.snapshot()
+        while not self.stopped.wait(self.interval):
+            current = self.snapshot()
+            changed = { x for x in previous.keys() | current.keys() if previous.get(x) != current.get(x) }
+            previous = current
+            if changed:
+                try:
+                    self.callback(changed)
+                except Exception:
+                    traceback.print_exc()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def warmup(filenames):
+    """ Import transforms in a background thread so the first click is quick """
+    def inner():
+        for filename in filenames:
+            try:
+                getmodule(filename)
+            except Exception as exc:   # reported again when it is clicked
+                print(f'Preload of {filename} failed: {exc}')
+    thread = threading.Thread(target=inner, name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def writeresult(result, fd):
+    """
+    Write a transform result to a text file object a piece at a time.
+    Strings are written as is, lists are lines and any other iterable
+    is a sequence of chunks.  Returns the number of characters written.
+    """
+    written = 0
+    for chunk in klipboard.chunks(result):
+        fd.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def get_clipboard_text():
+    return backend.get_text()
+
+
+def get_clipboard_cells():
+    return backend.get_cells()
+
+
+def set_clipboard_text(text):
+    if isinstance(text, list):
+        text = '\n'.join(text)
+    backend.set_text(text)
+
+
+class Cancelled(Exception):
+    """ Raised inside a run once its job is cancelled """
+
+
+def textreader(data, job=None, cells=None):
+    """
+    Make a textlines() callable over a snapshot of the clipboard text.
+    textlines() returns a kliplines.LineIndex built on the first call and
+    shared by later calls, so every pass reads the same snapshot.
+    textlines('cells') is the rows of cells of a spreadsheet copy, when
+    the run was given them, otherwise None.
+    With a job the lines read are counted in job.lines and the run is
+    abandoned once job.cancelled is set.
+    """
+    index = None
+
+    def textlines(type=None):
+        nonlocal index
+        if type == 'cells':
+            return cells
+        if type == 'rawtext':
+            return (data,)
+        if index is None:   # defaults to the stripped lines:
+            index = kliplines.LineIndex(data, job, Cancelled)
+        return index
+    return textlines
+
+
+def readdata(type=None):
+    # Only supports text (at the moment)
+    return textreader(get_clipboard_text())(type)
+
+
+def getcache():
+    """ The result cache, resized or dropped to follow config['cache-size'] """
+    global cache
+
+    maxbytes = int(config.get('cache-size', 0) * 2**20)
+    if maxbytes <= 0:
+        cache = None
+    elif cache is None:
+        cache = klipcache.ResultCache(maxbytes)
+    else:
+        cache.maxbytes = maxbytes
+    return cache
+
+
+def cacheable(module):
+    """
+    False for a module declaring CACHEABLE = False, eg. one reading or writing
+    files named in its options, whose results the cache can't key on
+    """
+    return getattr(module, 'CACHEABLE', True)
+
+
+# Capabilities a transform may declare in its CAPABILITIES set, placed after
+# the script's imports.  They tell KlipChop how a large clipboard may be run,
+# the engine for each run is chosen from them and the input size
+# (klipexec.chooseengine), a script declaring none always runs inline:
+#   line_independent - each output line depends only on its own input line.
+#                      The module has mapline(line, config) returning the
+#                      output line (None to drop it) and a count, and SUMMARY,
+#                      the message format for the total {count}.
+#   raw_lines        - mapline() gets and returns lines with their line endings
+#   streaming        - main() reads textlines() in order, without len() or indexing
+#   needs_full_input - must see the whole input at once, never split up
+#   cpu_bound        - worth a process of its own for large inputs
+#   cells            - main() reads textlines('cells'), the rows of cells of
+#                      a spreadsheet copy (klipboard.payloadcells) or None
+CAPABILITIES = ('line_independent', 'raw_lines', 'streaming', 'needs_full_input', 'cpu_bound', 'cells')
+
+
+def capabilities(module):
+    return getattr(module, 'CAPABILITIES', ())
+
+
+def inlineengine(module, data, messagefunc, runconfig, job=None, cells=None):
+    """ Run main() in the calling thread """
+    return module.main(textreader(data, job, cells), messagefunc, runconfig)
+
+
+def maplines(module, lines, messagefunc, config):
+    """
+    Generator of a line_independent module's mapline() output over lines,
+    BATCHSIZE lines a chunk, notifying its SUMMARY of the count at the end.
+    """
+    mapline = module.mapline
+    raw = 'raw_lines' in capabilities(module)
+    lines = iter(lines)
+    count = 0
+    started = False
+    while batch := list(islice(lines, kliplines.BATCHSIZE)):
+        output = list()
+        for line in batch:
+            text, n = mapline(line, config)
+            count += n
+            if text is not None:
+                output.append(text)
+        if not output:
+            continue
+        if raw:
+            yield ''.join(output)
+        else:
+            yield '\n'.join(output) if not started else '\n' + '\n'.join(output)
+            started = True
+    summary = getattr(module, 'SUMMARY', None)
+    if summary:
+        messagefunc(summary.format(count=count))
+
+
+def streamengine(module, data, messagefunc, runconfig, job=None, cells=None):
+    """
+    Run a line_independent module through mapline() or a streaming one over
+    one pass lines, no line index is built and the result is produced as it
+    is put on the clipboard.
+    """
+    if 'line_independent' in capabilities(module) and hasattr(module, 'mapline'):
+        raw = 'raw_lines' in capabilities(module)
+        return maplines(module, kliplines.iterlines(data, raw, job, Cancelled), messagefunc, runconfig)
+
+    def textlines(type=None):
+        if type == 'cells':
+            return cells
+        if type == 'rawtext':
+            return (data,)
+        return kliplines.iterlines(data, False, job, Cancelled)
+    return module.main(textlines, messagefunc, runconfig)
+
+
+def runtransform(module, messagefunc, job=None, engine=inlineengine):
+    """
+    Run a transform module over the clipboard, the result is only written back
+    on success and not at all if the job was cancelled.  Each completed run is
+    passed to the stats recorder when there is one.  Returns the result as a
+    klipboard.TextResult, the pieces the transform produced are never joined
+    unless the backend needs one string.  A cells module also gets the cells
+    of a spreadsheet copy, read from the clipboard with the text.
+    """
+    name = job.name if job is not None else menuname(module.__file__)
+    started = time.perf_counter()
+    data = get_clipboard_text()
+    if data is None:
+        return None
+    cells = get_clipboard_cells() if 'cells' in capabilities(module) else None
+    run = {
+        'name': name,
+        'cached': False,
+        'engine': None,
+        'inbytes': 2 * len(data),
+        'inlines': data.count('\n') + 1 if data else 0,
+        'readtime': time.perf_counter() - started,
+        'peakbytes': None,
+    }
+
+    resultcache = getcache() if cacheable(module) else None   # no hash of the text for nothing
+    if resultcache is not None:
+        basekey = resultcache.basekey(data, module.__file__, getattr(module, 'sourcefiles', None), cells)
+        cached = resultcache.get(basekey, config)
+        if cached:
+            output, messages = cached
+            for message in messages:
+                messagefunc(message)
+            run.update(cached=True, runtime=0.0, cputime=0.0)
+            writeclipboard(output, run)
+            return output
+
+    messages = list()
+    def notify(message):
+        messages.append(message)
+        messagefunc(message)
+    runconfig = klipcache.RecordingConfig(config)
+    spillchars = int(config['spill-size'] * 2**20) // 2 if config['delayed-render'] else None
+
+    tracing = recorder is not None and recorder.starttrace()
+    started, cpustarted = time.perf_counter(), time.thread_time()
+    try:
+        result = engine(module, data, notify, runconfig, job, cells)
+        # Streamed results are produced here:
+        output = klipboard.TextResult(result, spillchars) if result is not None else None
+    finally:
+        run['engine'] = getattr(job, 'engine', None) or engine.__name__
+        run['runtime'] = time.perf_counter() - started
+        run['cputime'] = time.thread_time() - cpustarted
+        if recorder is not None:
+            run['peakbytes'] = recorder.stoptrace(tracing)
+    if job is not None and job.cancelled.is_set():
+        raise Cancelled(job.name)
+    if output is not None and resultcache is not None:
+        resultcache.put(basekey, runconfig, output, messages)
+    writeclipboard(output, run)
+    return output
+
+
+def writeclipboard(output, run):
+    """ Put a TextResult on the clipboard and record the run """
+    started = time.perf_counter()
+    if output is not None:
+        backend.set_result(output, config['delayed-render'])
+    run['writetime'] = time.perf_counter() - started
+    run['outbytes'], run['outlines'] = klipstats.outsize(output)
+    if recorder is not None:
+        recorder.add(run)
@@ -0,0 +1,131 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipcsv.py - CSV reading and writing for KlipChop transforms.
+
+"""
+klipcsv.py  - CSV rows in and out through the csv module's C parser.
+
+rows() sniffs the dialect from the first SAMPLE lines and parses the
+clipboard's raw text into lists of cells, so quoted cells may hold the
+separator, quotes and even line ends.  config['separator'] stays the
+delimiter whenever the sample holds it, otherwise csv.Sniffer's pick from
+DELIMITERS is used (eg. a tab separated paste with the default ',').  The
+sniffer only guesses the delimiter, quote character and whether spaces
+follow delimiters, doubled quotes are always read as one.  Cells are
+stripped as the lines are, and a blank line is a row of one empty cell.
+
+A spreadsheet copy already in cells (textlines('cells'), see klipboard.py)
+is used as it is, the text is then not parsed at all.
+
+chunks() writes rows back out a batch at a time and quoter() quotes single
+values, both only quoting when a value needs it.  The csv module only takes a
+one character delimiter, a longer separator is split and joined as plain text.
+
+    params, cells = klipcsv.rows(textlines, config['separator'])
+    for row in cells:
+        ...
+"""
+
+import io
+import csv
+
+from itertools import chain, islice
+
+import kliplines
+
+
+SAMPLE = 50            # lines sniffed for the dialect
+DELIMITERS = ',;\t|'   # the sniffer's candidates besides config['separator']
+BATCHROWS = 4096       # rows written out at a time
+
+# How Excel writes the text of a copy, tab separated and quoted when needed:
+EXCELTEXT = {'delimiter': '\t', 'quotechar': '"', 'doublequote': True, 'skipinitialspace': False}
+
+
+def sniff(sample, separator):
+    """ csv reader keyword arguments for the sample lines (with their line ends) """
+    text = ''.join(sample)
+    params = {'delimiter': separator, 'quotechar': '"', 'doublequote': True, 'skipinitialspace': False}
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=DELIMITERS + separator)
+    except csv.Error:   # eg. a single column
+        return params
+    if separator not in text:
+        params['delimiter'] = dialect.delimiter
+    params['quotechar'] = dialect.quotechar or '"'
+    params['skipinitialspace'] = dialect.skipinitialspace
+    return params
+
+
+def reader(lines, separator, params=None):
+    """
+    (params, generator of the rows of stripped cells of the lines) from
+    lines with their line ends, a blank line gives [''].  params are sniffed
+    unless given.
+    """
+    lines = iter(lines)
+    if len(separator) != 1:
+        return {'delimiter': separator}, splitrows(lines, separator)
+    sample = list(islice(lines, SAMPLE))
+    params = params or sniff(sample, separator)
+    return params, stripped(csv.reader(chain(sample, lines), **params))
+
+
+def stripped(rows):
+    for row in rows:
+        yield list(map(str.strip, row)) or [ '' ]
+
+
+def splitrows(lines, separator):
+    for line in map(str.strip, lines):
+        yield list(map(str.strip, line.split(separator)))
+
+
+def notblank(rows):
+    """ The rows that aren't blank lines """
+    return (x for x in rows if len(x) > 1 or x[0])
+
+
+def rows(textlines, separator, params=None):
+    """
+    (params, generator of the rows) of a transform's input, see reader().
+    The cells of a spreadsheet copy come with the params of its text.
+    """
+    cells = textlines('cells')
+    if cells is not None:
+        return EXCELTEXT, stripped(cells)
+    return reader(kliplines.rawlines(textlines('rawtext'), True), separator, params)
+
+
+def quoter(separator):
+    """ Function returning a value CSV quoted when it holds the separator, a quote or a line end """
+    if len(separator) != 1:
+        return str
+
+    def quote(value):
+        if separator in value or '"' in value or '\n' in value or '\r' in value:
+            return '"' + value.replace('"', '""') + '"'
+        return value
+    return quote
+
+
+def chunks(rows, separator, done=None):
+    """ Generator of the rows as CSV text a batch at a time, then done(count) """
+    buffer = io.StringIO()
+    if len(separator) == 1:
+        writerows = csv.writer(buffer, delimiter=separator, lineterminator='\n').writerows
+    else:
+        def writerows(batch):
+            buffer.writelines(separator.join(x) + '\n' for x in batch)
+    rows = iter(rows)
+    count = 0
+    while batch := list(islice(rows, BATCHROWS)):
+        buffer.seek(0)
+        buffer.truncate()
+        writerows(batch)
+        text = buffer.getvalue()[:-1]
+        yield text if not count else '\n' + text
+        count += len(batch)
+    if done is not None:
+        done(count)
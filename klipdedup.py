@@ -0,0 +1,168 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipdedup.py - Ordered de-duplication for KlipChop transforms.
+
+"""
+klipdedup.py  - Distinct lines in order of first appearance, within a memory budget.
+
+unique() keeps the distinct items in a dict, which remembers insertion order,
+so each item is checked once rather than against a list of everything so far.
+While the distinct items fit in the budget the result is a list.  Past it the
+work goes to disk: every item is written with its position to one of
+PARTITIONS temporary files chosen by hash, so all copies of an item land in
+the same file.  Each partition is then de-duplicated in memory on its own (or
+partitioned again if it is still too big) and the partitions' first
+appearances are merged back into order.  The result is then a generator.
+
+sort() is the matching external sort, sorted runs of a budget's worth of
+items merged from temporary files.  joined() streams either kind of result
+as transform output.
+
+    budget = klipdedup.budget(config)
+    result = klipdedup.unique(textlines(), budget)
+
+The temporary directories are removed with ignore_cleanup_errors (Python
+3.10), as Windows won't delete a file a merge left unfinished still holds.
+"""
+
+import os
+import heapq
+import struct
+import tempfile
+
+from itertools import islice
+
+
+PARTITIONS = 64       # temporary files an over budget input is split into
+MAXDEPTH = 3          # times a partition may be split again
+BATCHSIZE = 4096      # items de-duplicated at a time in memory
+ENTRYBYTES = 100      # dict entry and str overhead per distinct item
+RECORD = struct.Struct('<QI')   # position, length of the UTF-8 item
+
+
+def budget(config):
+    """ Bytes of distinct items kept in memory from config['dedup-memory'] MB, None for no limit """
+    return int(config.get('dedup-memory', 0) * 2**20) or None
+
+
+def unique(items, budget=None):
+    """
+    The distinct items (str) in order of first appearance, a list if they
+    fit in budget bytes else a generator working from temporary files.
+    """
+    if budget is None:
+        return list(dict.fromkeys(items))
+    items = iter(items)
+    seen = dict()
+    size = 0
+    while batch := list(islice(items, BATCHSIZE)):
+        before = len(seen)
+        seen.update(dict.fromkeys(batch))
+        added = len(seen) - before
+        if added:
+            size += added * (ENTRYBYTES + sum(map(len, batch)) // len(batch))
+            if size > budget:
+                # Everything seen so far comes before any later item
+                pairs = enumerate(seen)
+                rest = enumerate(items, len(seen))
+                return (item for _, item in spill(seen, pairs, rest, budget, 0))
+    return list(seen)
+
+
+def firsts(pairs, budget, depth):
+    """ (position, item) of the first appearance of each item in pairs, in position order """
+    seen = dict()
+    size = 0
+    pairs = iter(pairs)
+    for position, item in pairs:
+        if item not in seen:
+            seen[item] = position
+            size += ENTRYBYTES + len(item)
+            if size > budget and depth < MAXDEPTH:
+                yield from spill(seen, ((i, x) for x, i in seen.items()), pairs, budget, depth)
+                return
+    for item, position in seen.items():
+        yield position, item
+
+
+def spill(seen, seenpairs, pairs, budget, depth):
+    """ Partition seenpairs then pairs to disk by hash and merge the partitions' firsts """
+    with tempfile.TemporaryDirectory(prefix='klipdedup', ignore_cleanup_errors=True) as tmpdir:
+        paths = [ os.path.join(tmpdir, f'{i}.part') for i in range(PARTITIONS) ]
+        files = [ open(path, 'wb', buffering=1 << 16) for path in paths ]
+        try:
+            for position, item in seenpairs:
+                writerecord(files[hash((depth, item)) % PARTITIONS], position, item)
+            seen.clear()
+            for position, item in pairs:
+                writerecord(files[hash((depth, item)) % PARTITIONS], position, item)
+        finally:
+            for fd in files:
+                fd.close()
+
+        outputs = list()
+        for path in paths:
+            with open(path + '.out', 'wb', buffering=1 << 16) as fd:
+                for position, item in firsts(readrecords(path), budget, depth + 1):
+                    writerecord(fd, position, item)
+            os.remove(path)
+            outputs.append(path + '.out')
+        yield from heapq.merge(*map(readrecords, outputs))
+
+
+def sort(items, budget=None):
+    """ items sorted, in memory for a list or within budget, else by merging sorted runs on disk """
+    if isinstance(items, list) or budget is None:
+        return sorted(items)
+    return externalsort(items, budget)
+
+
+def externalsort(items, budget):
+    with tempfile.TemporaryDirectory(prefix='klipsort', ignore_cleanup_errors=True) as tmpdir:
+        runs = list()
+        items = iter(items)
+        while True:
+            run = list()
+            size = 0
+            for item in items:
+                run.append(item)
+                size += ENTRYBYTES + len(item)
+                if size > budget:
+                    break
+            if not run:
+                break
+            run.sort()
+            path = os.path.join(tmpdir, f'{len(runs)}.run')
+            with open(path, 'wb', buffering=1 << 16) as fd:
+                for item in run:
+                    writerecord(fd, 0, item)
+            runs.append(path)
+            del run
+        for _, item in heapq.merge(*map(readrecords, runs), key=lambda x: x[1]):
+            yield item
+
+
+def joined(items, separator, done=None):
+    """ Generator of items with separator between them, a batch per chunk, then done(count) """
+    items = iter(items)
+    count = 0
+    while batch := list(islice(items, BATCHSIZE)):
+        yield separator.join(batch) if not count else separator + separator.join(batch)
+        count += len(batch)
+    if done is not None:
+        done(count)
+
+
+def writerecord(fd, position, item):
+    data = item.encode('utf-8', 'surrogatepass')
+    fd.write(RECORD.pack(position, len(data)))
+    fd.write(data)
+
+
+def readrecords(path):
+    """ Generator of the (position, item) records in a file """
+    with open(path, 'rb', buffering=1 << 16) as fd:
+        while header := fd.read(RECORD.size):
+            position, length = RECORD.unpack(header)
+            yield position, fd.read(length).decode('utf-8', 'surrogatepass')
@@ -0,0 +1,361 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipexec.py - Run KlipChop transforms off the tray event thread.
+
+"""
+klipexec.py  - Worker pool for transform runs.
+
+Every run goes to a worker thread so the tray stays responsive.  Which
+engine runs the transform is chosen per run from the module's CAPABILITIES
+and the number of input lines (see chooseengine): small inputs run inline,
+larger ones are streamed where the transform allows, cpu_bound work gets a
+process of its own (processengine) and very large line_independent work is
+split over a pool of worker processes (parallelengine).  The worker thread
+just waits on them.
+
+While a run is in progress it is notified every config['progress'] seconds,
+it can be cancelled from the menu and is cancelled after config['timeout']
+seconds (or the module's TIMEOUT).  Thread runs stop at the next line read,
+process runs are terminated.  The clipboard is only written by a run that
+completes.
+"""
+
+import os
+import time
+import threading
+import traceback
+import multiprocessing
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import klipcore
+import klipcache
+import kliplines
+from klipcore import config, Cancelled
+
+
+CHUNKSIZE = 1 << 20   # characters of input per parallel task
+
+# The worker process pool, started on first use or by warmpool() and kept:
+pool = None
+poolsize = 0
+poollock = threading.Lock()
+
+# Transforms loaded in a pool worker, filename: (mtime, module)
+workermodules = dict()
+
+
+class Job:
+    """ One transform run """
+
+    def __init__(self, name):
+        self.name = name
+        self.lines = 0
+        self.started = time.perf_counter()
+        self.cancelled = threading.Event()
+        self.future = None
+        self.engine = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class ChildJob:
+    """ Job stand-in in the child process, passes progress back up the pipe """
+
+    def __init__(self, name, conn):
+        self.name = name
+        self.conn = conn
+        self.cancelled = threading.Event()   # never set, the parent terminates us
+        self.sent = time.perf_counter()
+        self._lines = 0
+
+    @property
+    def lines(self):
+        return self._lines
+
+    @lines.setter
+    def lines(self, value):
+        self._lines = value
+        now = time.perf_counter()
+        if now - self.sent >= 1:
+            self.conn.send(('lines', value))
+            self.sent = now
+
+
+def childrun(conn, filename, name, data, runconfig, streamed=False, cells=None):
+    """ Entry point of the transform process """
+    try:
+        module = klipcore.loadmodule(filename)
+        job = ChildJob(name, conn)
+        messages = list()
+        recording = klipcache.RecordingConfig(runconfig)
+        engine = klipcore.streamengine if streamed else klipcore.inlineengine
+        result = engine(module, data, messages.append, recording, job, cells)
+        if isinstance(result, list):
+            result = '\n'.join(result)
+        elif result is not None and not isinstance(result, str):
+            result = ''.join(result)
+        conn.send(('done', result, messages, recording.readkeys))
+    except Exception:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def processengine(module, data, messagefunc, runconfig, job, cells=None):
+    """
+    Engine for klipcore.runtransform running the transform in its own process,
+    streamed there when it is line_independent.
+    """
+    streamed = 'line_independent' in klipcore.capabilities(module)
+    context = multiprocessing.get_context('spawn')
+    parentconn, childconn = context.Pipe(duplex=False)
+    process = context.Process(target=childrun, name=f'transform {job.name}', daemon=True,
+        args=(childconn, module.__file__, job.name, data, dict(runconfig), streamed, cells))
+    process.start()
+    childconn.close()
+    try:
+        while True:
+            if job.cancelled.is_set():
+                raise Cancelled(job.name)
+            if not parentconn.poll(0.2):
+                if not process.is_alive():
+                    raise RuntimeError(f'{job.name} process exited with code {process.exitcode}')
+                continue
+            reply = parentconn.recv()
+            if reply[0] == 'lines':
+                job.lines = reply[1]
+            elif reply[0] == 'done':
+                _, result, messages, readkeys = reply
+                runconfig.readkeys.update(readkeys)
+                for message in messages:
+                    messagefunc(message)
+                return result
+            else:
+                raise RuntimeError(f'Error running {job.name}:\n\n{reply[1]}')
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        parentconn.close()
+
+
+def getpool():
+    """ The worker process pool, config['processes'] workers or one per CPU """
+    global pool, poolsize
+
+    with poollock:
+        if pool is None:
+            poolsize = config['processes'] or os.cpu_count() or 1
+            pool = ProcessPoolExecutor(poolsize, multiprocessing.get_context('spawn'))
+        return pool
+
+
+def warmpool():
+    """ Start every pool worker now so the first parallel run doesn't wait for them """
+    executor = getpool()
+    for _ in range(poolsize):
+        executor.submit(os.getpid)
+
+
+def shutdownpool():
+    global pool
+
+    with poollock:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = None
+
+
+def workermodule(filename, mtime):
+    """ A transform in a pool worker, loaded again once the script changes """
+    cached = workermodules.get(filename)
+    if cached is None or cached[0] != mtime:
+        cached = workermodules[filename] = (mtime, klipcore.loadmodule(filename))
+    return cached[1]
+
+
+def mapchunk(text, filename, mtime, raw, runconfig):
+    """
+    Pool worker task, mapline() over the lines of a chunk of the input.
+    Returns (output text, output lines, count, input lines, config keys read)
+    """
+    mapline = workermodule(filename, mtime).mapline
+    recording = klipcache.RecordingConfig(runconfig)
+    output = list()
+    count = 0
+    lines = 0
+    for line in kliplines.iterlines(text, raw):
+        lines += 1
+        line, n = mapline(line, recording)
+        count += n
+        if line is not None:
+            output.append(line)
+    return ('' if raw else '\n').join(output), len(output), count, lines, recording.readkeys
+
+
+def parallelengine(module, data, messagefunc, runconfig, job=None, cells=None):
+    """
+    Engine for klipcore.runtransform mapping a line_independent module over
+    the pool.  The input is cut into CHUNKSIZE pieces at line ends, at most
+    two per worker are in flight and the output is yielded in input order.
+    mapline() only sees lines, cells are not passed on.
+    """
+    raw = 'raw_lines' in klipcore.capabilities(module)
+    args = (module.__file__, klipcore.filemtime(module.__file__), raw, dict(runconfig))
+    executor = getpool()
+
+    def results():
+        pending = deque()
+        spans = kliplines.blocks(data, CHUNKSIZE)
+        count = 0
+        started = False
+        try:
+            while True:
+                while len(pending) < 2 * poolsize and (span := next(spans, None)):
+                    pending.append(executor.submit(mapchunk, data[span[0]:span[1]], *args))
+                if not pending:
+                    break
+                if job is not None and job.cancelled.is_set():
+                    raise Cancelled(job.name)
+                text, outlines, n, lines, readkeys = pending.popleft().result()
+                count += n
+                runconfig.readkeys.update(readkeys)
+                if job is not None:
+                    job.lines += lines
+                if outlines:
+                    yield text if raw or not started else '\n' + text
+                    started = True
+        except BrokenProcessPool:
+            shutdownpool()   # a fresh pool next time
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+        summary = getattr(module, 'SUMMARY', None)
+        if summary:
+            messagefunc(summary.format(count=count))
+    return results()
+
+
+def chooseengine(module, data):
+    """
+    The engine for a run of module over data.  Inputs under stream-lines
+    run inline, past that line_independent and streaming modules are
+    streamed, cpu_bound modules get a process and line_independent ones of
+    at least process-lines lines the process pool.  needs_full_input is
+    never split up, though it may be streamed.
+    """
+    capabilities = klipcore.capabilities(module)
+    lines = data.count('\n') + 1
+    if lines < config['stream-lines']:
+        return klipcore.inlineengine
+    wholeinput = 'needs_full_input' in capabilities
+    independent = 'line_independent' in capabilities and hasattr(module, 'mapline') and not wholeinput
+    if independent and lines >= config['process-lines']:
+        return parallelengine
+    if 'cpu_bound' in capabilities:
+        return processengine
+    if independent or 'streaming' in capabilities:
+        return klipcore.streamengine
+    return klipcore.inlineengine
+
+
+def scheduledengine(module, data, messagefunc, runconfig, job, cells=None):
+    """ Engine for klipcore.runtransform running each transform on the engine chooseengine picks """
+    engine = chooseengine(module, data)
+    if job is not None:
+        job.engine = engine.__name__
+    return engine(module, data, messagefunc, runconfig, job, cells)
+
+
+class TransformRunner:
+    """
+    Runs transforms on a pool of worker threads.
+        messagefunc - notifications (icon.notify)
+        errorfunc   - called with the traceback text of a failed run
+        onchange    - called when runs start or finish, eg. to refresh the menu
+    """
+
+    def __init__(self, messagefunc, errorfunc, onchange=None):
+        self.messagefunc = messagefunc
+        self.errorfunc = errorfunc
+        self.onchange = onchange
+        self.executor = ThreadPoolExecutor(max(config['workers'], 1), thread_name_prefix='transform')
+        self.jobs = set()
+        self.lock = threading.Lock()
+
+    @property
+    def running(self):
+        return bool(self.jobs)
+
+    def run(self, name, filename):
+        job = Job(name)
+        with self.lock:
+            self.jobs.add(job)
+        self.changed()
+        job.future = self.executor.submit(self.work, job, filename)
+        return job
+
+    def work(self, job, filename):
+        timers = list()
+        try:
+            module = klipcore.getmodule(filename)
+            timeout = getattr(module, 'TIMEOUT', config['timeout'])
+            if timeout:
+                timers.append(threading.Timer(timeout, job.cancel))
+            if config['progress']:
+                timers.append(threading.Timer(config['progress'], self.progress, (job,)))
+            for timer in timers:
+                timer.daemon = True
+                timer.start()
+
+            klipcore.runtransform(module, self.messagefunc, job, scheduledengine)
+
+            if config['progress'] and job.elapsed >= config['progress']:
+                self.messagefunc(f'{job.name} finished in {job.elapsed:.1f} seconds')
+        except Cancelled:
+            reason = 'timed out' if timeout and job.elapsed >= timeout else 'cancelled'
+            self.messagefunc(f'{job.name} {reason} after {job.elapsed:.1f} seconds, clipboard unchanged')
+        except Exception:
+            self.errorfunc(f'Error running {job.name}:\n\n{traceback.format_exc()}\n')
+        finally:
+            for timer in timers:
+                timer.cancel()
+            with self.lock:
+                self.jobs.discard(job)
+            self.changed()
+
+    def progress(self, job):
+        """ Notify and reschedule until the job is finished """
+        if job not in self.jobs or job.cancelled.is_set():
+            return
+        self.messagefunc(f'{job.name}: {job.lines:,d} lines after {job.elapsed:.0f} seconds')
+        timer = threading.Timer(config['progress'], self.progress, (job,))
+        timer.daemon = True
+        timer.start()
+
+    def cancel(self):
+        """ Cancel every running job """
+        with self.lock:
+            jobs = list(self.jobs)
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    def changed(self):
+        if self.onchange:
+            self.onchange()
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False)
+        shutdownpool()
@@ -0,0 +1,144 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# kliplines.py - Line index over one snapshot of the clipboard text.
+
+"""
+kliplines.py  - LineIndex, what textlines() returns for clipboard runs.
+
+Rather than a list of stripped lines, the index keeps the start and end
+offset of each stripped line in two arrays over the one clipboard string.
+Lines are only sliced out as they are used, so a transform can take len(),
+index lines directly and make as many passes as it likes for 16 bytes
+(8 below 4GB) per line.  Lines and stripping follow str.splitlines() and
+str.strip() exactly.
+
+iterlines() is the one pass alternative for streaming transforms, the lines
+are split a block at a time and nothing is kept once they are read.
+rawlines() does the same for text arriving in pieces cut anywhere, such as
+textlines('rawtext'), keeping each line's leading and trailing spaces.
+"""
+
+from array import array
+from itertools import accumulate, islice
+from operator import add, sub
+
+
+BLOCKSIZE = 1 << 20   # characters split at a time while indexing
+BATCHSIZE = 1024      # lines between job progress/cancel checks
+
+
+def blocks(text, blocksize=BLOCKSIZE):
+    """ (start, end) of blocksize or so pieces of text, cut after a \n so a \r\n pair is never split """
+    pos = 0
+    size = len(text)
+    while pos < size:
+        if pos + blocksize >= size:
+            cut = size
+        else:
+            cut = text.rfind('\n', pos, pos + blocksize) + 1
+            if cut <= pos:
+                cut = text.find('\n', pos + blocksize) + 1 or size
+        yield pos, cut
+        pos = cut
+
+
+def iterlines(text, keepends=False, job=None, cancelledexc=None):
+    """
+    Generator of the stripped lines of text, or the raw lines with their
+    line endings with keepends.  With a job it counts and checks as
+    LineIndex iteration does.
+    """
+    count = 0
+    for pos, cut in blocks(text):
+        lines = text[pos:cut].splitlines(keepends)
+        if not keepends:
+            lines = list(map(str.strip, lines))
+        if job is None:
+            yield from lines
+            continue
+        for i in range(0, len(lines), BATCHSIZE):
+            if job.cancelled.is_set():
+                raise cancelledexc(job.name)
+            batch = lines[i:i + BATCHSIZE]
+            yield from batch
+            count += len(batch)
+            job.lines = count
+
+
+def rawlines(pieces, keepends=False):
+    """ Generator of the unstripped lines (with their line ends if keepends) of text given in pieces """
+    carry = list()
+    for piece in pieces:
+        cut = piece.rfind('\n') + 1
+        if not cut:   # no line ends yet, keep it for the next piece
+            carry.append(piece)
+            continue
+        carry.append(piece[:cut])
+        text = ''.join(carry)
+        for pos, end in blocks(text):
+            yield from text[pos:end].splitlines(keepends)
+        carry = [ piece[cut:] ] if cut < len(piece) else []
+    if carry:
+        text = ''.join(carry)
+        for pos, end in blocks(text):
+            yield from text[pos:end].splitlines(keepends)
+
+
+class LineIndex:
+    """
+    Re-iterable view of the stripped lines of text.
+    With a job the lines read are counted in job.lines and iteration raises
+    job.cancelledexc once job.cancelled is set.
+    """
+
+    def __init__(self, text, job=None, cancelledexc=None):
+        self.text = text
+        self.job = job
+        self.cancelledexc = cancelledexc
+        typecode = 'I' if len(text) < 2**32 else 'Q'
+        self.starts = array(typecode)
+        self.ends = array(typecode)
+        self.build()
+
+    def build(self):
+        """ Index a block of lines at a time, the arithmetic all runs in C """
+        text, starts, ends = self.text, self.starts, self.ends
+        for pos, cut in blocks(text):
+            lines = text[pos:cut].splitlines(True)
+            lengths = list(map(len, lines))
+            rawstarts = list(accumulate(lengths, initial=pos))
+            rawstarts.pop()
+            starts.extend(map(add, rawstarts, map(sub, lengths, map(len, map(str.lstrip, lines)))))
+            ends.extend(map(add, rawstarts, map(len, map(str.rstrip, lines))))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(map(self.text.__getitem__, map(slice, self.starts[i], self.ends[i])))
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def __iter__(self):
+        lines = map(self.text.__getitem__, map(slice, self.starts, self.ends))
+        job = self.job
+        if job is None:
+            return lines
+        return self.checked(lines, job)
+
+    def checked(self, lines, job):
+        count = 0
+        while True:
+            if job.cancelled.is_set():
+                raise self.cancelledexc(job.name)
+            batch = list(islice(lines, BATCHSIZE))
+            if not batch:
+                break
+            yield from batch
+            count += len(batch)
+            job.lines = count
+
+    def spans(self):
+        """ (start, end) offsets of every stripped line """
+        return zip(self.starts, self.ends)
@@ -0,0 +1,287 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipnumbers.py - Number extraction, statistics and base conversion for KlipChop transforms.
+
+"""
+klipnumbers.py  - Find the numbers in a text, summarise or convert them.
+
+extract() scans the whole text with one regex and splits the tokens three
+ways: decimal integers and 0x hex are kept as exact Python ints, anything
+with a decimal point is a float.  statistics() then works on the values in
+bulk.  With NumPy installed the values are converted and summarised in C
+over a float64 array (the sum stays exact for integers), without it the same
+figures come from sorted() and math.fsum().  extractcells() does the same
+for the cells of a spreadsheet copy, converting whole number cells straight
+and only scanning the rest.
+
+Running gives the same figures in constant memory for input too big to hold,
+updated a batch of numbers at a time.  The count, sum, mean, stdev, min and
+max are exact (or as exact as float sums get), the median and percentiles
+come from a klipsketch.KLL sketch.  state() saves it as JSON and merge()
+adds another, so runs over separate files or captures can be combined:
+
+    running = klipnumbers.Running()
+    running.update(*klipnumbers.extract(text))
+    json.dump(running.state(), fd)
+
+rebase() is the base conversion shared by dec2hex and hex2dec.  TOKEN finds
+every number in one scan and names its kind (see KINDS): decimal, 0x hex,
+bare hex (a word of hex digits with both a digit and a letter), colon or
+dash separated byte strings (WWNs, MACs) and 0b binary.  Numbers of the
+wanted kinds are replaced in the same pass, left padded with spaces to their
+old width when the new form is shorter so columns stay lined up:
+
+    text, count = klipnumbers.rebase(text, {'decimal'}, klipnumbers.hexformat)
+"""
+
+import re
+import math
+
+from itertools import repeat
+
+import klipsketch
+
+try:
+    import numpy
+except ImportError:   # optional, the pure Python path gives the same figures
+    numpy = None
+
+
+NUMBER = re.compile(r'0[xX][\da-fA-F]+|\d+\.?\d*|\.\d+')
+PERCENTILES = (90, 95, 99)
+
+TOKEN = re.compile(r'''(?=[\da-fA-F])(?:     # skips the scan past anything that can't start a number
+      (?P<bytes>\b[\da-fA-F]{2}(?P<sep>[:-])[\da-fA-F]{2}(?:(?P=sep)[\da-fA-F]{2}){2,}\b)
+    | (?P<hex>0[xX][\da-fA-F]+)
+    | (?P<binary>0[bB][01]+\b)
+    | (?P<float>\d+\.\d+)
+    | (?P<barehex>\b(?=[\da-fA-F]*\d)(?=[\da-fA-F]*[a-fA-F])[\da-fA-F]+\b)
+    | (?P<decimal>\d+))
+''', re.VERBOSE)
+KINDS = ('bytes', 'hex', 'binary', 'float', 'barehex', 'decimal')   # float is never converted
+
+
+def extract(text, dp='.'):
+    """
+    (ints, floats) found in text, a list of ints and a list of float strings.
+    With no number found and a locale decimal point other than '.' the text
+    is scanned again with that as the decimal point.
+    """
+    tokens = NUMBER.findall(text)
+    if not tokens and dp != '.':
+        tokens = NUMBER.findall(text.replace(dp, '.'))
+    try:
+        return list(map(int, tokens)), []   # all decimal integers, the usual case
+    except ValueError:
+        pass
+    floats = [ x for x in tokens if '.' in x ]
+    hexes = [ x for x in tokens if 'x' in x or 'X' in x ]
+    ints = [ int(x) for x in tokens if x.isdigit() ]
+    ints.extend(map(int, hexes, repeat(16)))
+    return ints, floats
+
+
+def extractcells(rows, dp='.'):
+    """ extract() of rows of cells, cells of only digits are converted without a scan """
+    cells = [ x for row in rows for x in row if x ]
+    ints = list(map(int, [ x for x in cells if x.isdecimal() ]))
+    more, floats = extract('\n'.join(x for x in cells if not x.isdecimal()), dp)
+    ints.extend(more)
+    return ints, floats
+
+
+def percentile(ordered, pct):
+    """ Linearly interpolated percentile of sorted values, as numpy.percentile does by default """
+    position = (len(ordered) - 1) * pct / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def intarray(ints):
+    """ float64 array of ints, converted in C while they fit in int64 """
+    try:
+        return numpy.array(ints, dtype=numpy.int64).astype(numpy.float64)
+    except OverflowError:   # eg. decimal WWNs
+        return numpy.fromiter(map(float, ints), numpy.float64, len(ints))
+
+
+def statistics(ints, floats):
+    """
+    dict of count, sum, mean, min, max, median, stdev and p90/p95/p99 of the
+    numbers, None if there are none.  sum, min and max are exact ints when
+    there are no floats.  stdev is the sample standard deviation.
+    """
+    count = len(ints) + len(floats)
+    if not count:
+        return None
+    if numpy is not None:
+        values = numpy.concatenate((intarray(ints), numpy.array(floats, dtype=numpy.float64)))
+        floatsum = float(values[len(ints):].sum())
+        low, high = float(values.min()), float(values.max())
+        median, *pcts = numpy.percentile(values, (50,) + PERCENTILES).tolist()
+        stdev = float(values.std(ddof=1)) if count > 1 else 0.0
+    else:
+        values = list(map(float, ints)) + list(map(float, floats))
+        floatsum = math.fsum(values[len(ints):])
+        ordered = sorted(values)
+        low, high = ordered[0], ordered[-1]
+        median = percentile(ordered, 50)
+        pcts = [ percentile(ordered, x) for x in PERCENTILES ]
+        if count > 1:
+            mean = math.fsum(values) / count
+            stdev = math.sqrt(math.fsum((x - mean) ** 2 for x in values) / (count - 1))
+        else:
+            stdev = 0.0
+
+    total = sum(ints) + floatsum if floats else sum(ints)
+    if not floats:   # exact, floats can't hold 64 bit WWN sized numbers
+        low, high = min(ints), max(ints)
+    result = {
+        'count': count,
+        'sum': total,
+        'mean': total / count,
+        'min': low,
+        'max': high,
+        'median': median,
+        'stdev': stdev,
+    }
+    result.update((f'p{x}', y) for x, y in zip(PERCENTILES, pcts))
+    return result
+
+
+class Running:
+    """ statistics() of numbers seen a batch at a time, in constant memory """
+
+    def __init__(self):
+        self.moments = klipsketch.Moments()
+        self.sketch = klipsketch.KLL()
+        self.intsum = 0         # exact
+        self.floatsum = 0.0
+        self.floats = 0         # how many of the numbers were floats
+        self.intlow = None      # exact min and max of the ints
+        self.inthigh = None
+
+    def update(self, ints, floats):
+        """ Add a batch of numbers as returned by extract() """
+        values = list(map(float, ints)) + list(map(float, floats))
+        self.moments.update(values)
+        self.sketch.update(values)
+        if ints:
+            self.intsum += sum(ints)
+            low, high = min(ints), max(ints)
+            self.intlow = low if self.intlow is None else min(self.intlow, low)
+            self.inthigh = high if self.inthigh is None else max(self.inthigh, high)
+        if floats:
+            self.floatsum += math.fsum(values[len(ints):])
+            self.floats += len(floats)
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+        self.intsum += other.intsum
+        self.floatsum += other.floatsum
+        self.floats += other.floats
+        if other.intlow is not None:
+            self.intlow = other.intlow if self.intlow is None else min(self.intlow, other.intlow)
+            self.inthigh = other.inthigh if self.inthigh is None else max(self.inthigh, other.inthigh)
+
+    def statistics(self):
+        """ The statistics() dict so far, None if no numbers were seen """
+        count = self.moments.count
+        if not count:
+            return None
+        total = self.intsum + self.floatsum if self.floats else self.intsum
+        median, *pcts = self.sketch.quantiles([ 0.5 ] + [ x / 100 for x in PERCENTILES ])
+        result = {
+            'count': count,
+            'sum': total,
+            'mean': total / count,
+            'min': self.moments.low if self.floats else self.intlow,
+            'max': self.moments.high if self.floats else self.inthigh,
+            'median': median,
+            'stdev': math.sqrt(self.moments.variance),
+        }
+        result.update((f'p{x}', y) for x, y in zip(PERCENTILES, pcts))
+        return result
+
+    def state(self):
+        return {
+            'moments': self.moments.state(),
+            'sketch': self.sketch.state(),
+            'intsum': self.intsum,
+            'floatsum': self.floatsum,
+            'floats': self.floats,
+            'intlow': self.intlow,
+            'inthigh': self.inthigh,
+        }
+
+    @classmethod
+    def fromstate(cls, state):
+        running = cls()
+        running.moments = klipsketch.Moments.fromstate(state['moments'])
+        running.sketch = klipsketch.KLL.fromstate(state['sketch'])
+        running.intsum, running.floatsum, running.floats = state['intsum'], state['floatsum'], state['floats']
+        running.intlow, running.inthigh = state['intlow'], state['inthigh']
+        return running
+
+
+def tokenvalue(kind, token):
+    """ int value of a TOKEN match of kind """
+    if kind == 'decimal':
+        return int(token)
+    if kind == 'binary':
+        return int(token, 2)
+    if kind == 'bytes':
+        return int(token.replace(':', '').replace('-', ''), 16)
+    return int(token, 16)
+
+
+def hexformat(value, prefix=True):
+    return f'0x{value:x}' if prefix else f'{value:x}'
+
+
+def rebase(text, kinds, render):
+    """
+    (text, count) with every number of kinds replaced by render(value) and
+    how many were, in one scan.  Shorter results are padded to the old width.
+    """
+    count = 0
+
+    def convert(match):
+        nonlocal count
+        kind = match.lastgroup
+        token = match.group()
+        if kind not in kinds:
+            return token
+        count += 1
+        result = render(tokenvalue(kind, token))
+        if len(result) < len(token):
+            result = ' ' * (len(token) - len(result)) + result
+        return result
+
+    return TOKEN.sub(convert, text), count
+
+
+def rebasepieces(pieces, kinds, render, done=None):
+    """
+    Generator of rebase()d text pieces, each cut after its last line end so
+    no number is split between two, then done(count)
+    """
+    count = 0
+    carry = ''
+    for piece in pieces:
+        piece = carry + piece
+        cut = piece.rfind('\n') + 1
+        carry = piece[cut:]
+        if cut:
+            piece, n = rebase(piece[:cut], kinds, render)
+            count += n
+            yield piece
+    if carry:
+        carry, n = rebase(carry, kinds, render)
+        count += n
+        yield carry
+    if done is not None:
+        done(count)
@@ -0,0 +1,240 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipsketch.py - Bounded memory summaries of large inputs for KlipChop transforms.
+
+"""
+klipsketch.py  - Sketches answering counting questions in fixed memory.
+
+SpaceSaving keeps counters for at most capacity items.  A new item takes over
+the counter of the least counted one, so every item seen at least
+total / capacity times is always there and a count is over by at most the
+error recorded for it.  HyperLogLog estimates how many distinct items there
+were from 2**precision one byte registers, about 1.04 / sqrt(2**precision)
+relative error (0.8% for the default 16K registers).
+
+Moments keeps the count, mean and variance of numbers (Welford's update,
+merged a batch at a time with Chan's formula) and KLL their distribution in
+compactors of at most about 3 * k values, so any quantile is within about
+1.7 / k of its rank (1% for the default k of 200) however many numbers there
+were.  Both can be saved with state(), a JSON ready dict, and merged with
+another of their kind, so summaries of separate inputs can be combined.
+
+They all take items a batch at a time (update()) so repeats within a batch
+are counted in C first.  HyperLogLog uses hash(), so its registers only mean
+anything within the one process.
+"""
+
+import math
+import heapq
+import random
+import bisect
+
+from collections import Counter
+from itertools import islice, accumulate
+
+
+BATCHSIZE = 1 << 16   # items counted at a time by feed()
+
+
+def feed(sketches, items):
+    """ Pass items to each sketch's update() a batch at a time """
+    items = iter(items)
+    while batch := list(islice(items, BATCHSIZE)):
+        for sketch in sketches:
+            sketch.update(batch)
+
+
+class SpaceSaving:
+    """ Approximate counts of the most frequent items in capacity counters """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = dict()    # item: count, never below the true count
+        self.errors = dict()    # item: the most count may be over by
+        self.heap = list()      # (count, item) one per item, count may lag behind counts
+        self.total = 0
+
+    def update(self, batch):
+        counts, errors, heap = self.counts, self.errors, self.heap
+        self.total += len(batch)
+        for item, n in Counter(batch).items():
+            if item in counts:
+                counts[item] += n
+            elif len(counts) < self.capacity:
+                counts[item] = n
+                errors[item] = 0
+                heapq.heappush(heap, (n, item))
+            else:
+                # Take over the least counted item's counter:
+                while True:
+                    low, victim = heap[0]
+                    if counts[victim] == low:
+                        break
+                    heapq.heapreplace(heap, (counts[victim], victim))
+                del counts[victim], errors[victim]
+                counts[item] = low + n
+                errors[item] = low
+                heapq.heapreplace(heap, (low + n, item))
+
+    def top(self, k):
+        """ The k most counted (item, count, error), most first """
+        return [ (item, count, self.errors[item])
+                 for item, count in heapq.nlargest(k, self.counts.items(), key=lambda x: x[1]) ]
+
+
+class HyperLogLog:
+    """ Estimate of the number of distinct items """
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def update(self, batch):
+        registers, p = self.registers, self.precision
+        mask = self.m - 1
+        width = 64 - p
+        for item in set(batch):
+            h = hash(item) & 0xffffffffffffffff
+            rank = width - (h >> p).bit_length() + 1
+            if rank > registers[h & mask]:
+                registers[h & mask] = rank
+
+    def estimate(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:   # small range, linear counting is better
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    @property
+    def relativeerror(self):
+        return 1.04 / math.sqrt(self.m)
+
+
+class Moments:
+    """ Count, mean, variance, min and max of numbers """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0       # sum of squared differences from the mean
+        self.low = math.inf
+        self.high = -math.inf
+
+    def update(self, batch):
+        if not batch:
+            return
+        n = len(batch)
+        mean = math.fsum(batch) / n
+        other = Moments()
+        other.count, other.mean = n, mean
+        other.m2 = math.fsum((x - mean) ** 2 for x in batch)
+        other.low, other.high = min(batch), max(batch)
+        self.merge(other)
+
+    def merge(self, other):
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.low = min(self.low, other.low)
+        self.high = max(self.high, other.high)
+
+    @property
+    def variance(self):
+        """ Sample variance """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def state(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'low': self.low, 'high': self.high}
+
+    @classmethod
+    def fromstate(cls, state):
+        moments = cls()
+        moments.count, moments.mean, moments.m2 = state['count'], state['mean'], state['m2']
+        moments.low, moments.high = state['low'], state['high']
+        return moments
+
+
+class KLL:
+    """ Approximate quantiles of numbers """
+
+    def __init__(self, k=200):
+        self.k = k
+        self.levels = [ list() ]   # level h holds values standing for 2**h each
+        self.size = 0
+
+    def capacity(self, level):
+        """ Values level may hold, smaller by 2/3 for each level below the top """
+        return max(math.ceil(self.k * (2 / 3) ** (len(self.levels) - level - 1)), 2)
+
+    def limit(self):
+        return sum(map(self.capacity, range(len(self.levels))))
+
+    def update(self, batch):
+        self.levels[0].extend(batch)
+        self.size += len(batch)
+        if self.size >= self.limit():
+            self.compress()
+
+    def compress(self):
+        level = 0
+        while level < len(self.levels):
+            values = self.levels[level]
+            if len(values) >= self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(list())
+                values.sort()
+                keep = values.pop() if len(values) % 2 else None
+                # Every other value, from a random start, stands for the pair at twice the weight:
+                self.levels[level + 1].extend(values[random.getrandbits(1)::2])
+                self.levels[level] = [] if keep is None else [keep]
+            level += 1
+        self.size = sum(map(len, self.levels))
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(list())
+        for level, values in enumerate(other.levels):
+            self.levels[level].extend(values)
+        self.size = sum(map(len, self.levels))
+        if self.size >= self.limit():
+            self.compress()
+
+    def quantiles(self, fractions):
+        """
+        Values at each of fractions (0 to 1) of the way through the numbers
+        seen, interpolated between neighbouring ranks as klipnumbers.percentile
+        does.  A value of weight w stands for w ranks in a row.
+        """
+        weighted = sorted((x, 1 << level) for level, values in enumerate(self.levels) for x in values)
+        if not weighted:
+            return [ None for _ in fractions ]
+        ends = list(accumulate(w for _, w in weighted))   # ranks up to and including each value
+        total = ends[-1]
+        def rank(i):
+            return weighted[bisect.bisect_right(ends, i)][0]
+        result = list()
+        for fraction in fractions:
+            position = (total - 1) * fraction
+            low = math.floor(position)
+            below, above = rank(low), rank(min(low + 1, total - 1))
+            result.append(below + (above - below) * (position - low))
+        return result
+
+    def state(self):
+        return {'k': self.k, 'levels': self.levels}
+
+    @classmethod
+    def fromstate(cls, state):
+        sketch = cls(state['k'])
+        sketch.levels = [ list(x) for x in state['levels'] ]
+        sketch.size = sum(map(len, sketch.levels))
+        return sketch
@@ -0,0 +1,158 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# klipstats.py - Per transform performance telemetry for KlipChop.
+
+"""
+klipstats.py  - Records how each transform run performed.
+
+klipcore.runtransform hands every run's measurements to Recorder.add():
+    name, when, cached, engine, inbytes, inlines, outbytes, outlines,
+    readtime, runtime, cputime, writetime, peakbytes
+Byte counts are the UTF-16 size the clipboard holds.  cputime is the worker
+thread's (a child process run shows only the waiting).  peakbytes is only
+measured for one run in config['stats-sample'] as tracemalloc slows the run
+down, it is None otherwise.  tracemalloc sees every thread, so a run is only
+traced when no other is running and its peak is dropped (None) if another
+run started before it finished.
+
+Each transform keeps a rolling window of recent runs and a log2 histogram
+of run times for the tray's Statistics menu, and every run is appended to
+a rotating JSONL log for collection from desktops.
+"""
+
+import os
+import json
+import time
+import threading
+import statistics
+import tracemalloc
+
+from collections import deque
+
+
+WINDOW = 100   # recent runs kept per transform
+
+
+class TransformStats:
+    """ Rolling figures for one transform """
+
+    def __init__(self):
+        self.runs = 0
+        self.cached = 0
+        self.recent = deque(maxlen=WINDOW)
+        self.histogram = dict()   # log2 bucket of milliseconds: count
+
+    def add(self, run):
+        self.runs += 1
+        if run['cached']:
+            self.cached += 1
+        self.recent.append(run)
+        ms = max(int(run['runtime'] * 1000), 1)
+        bucket = ms.bit_length() - 1   # 2**bucket <= ms < 2**(bucket+1)
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def percentile(self, key, pct):
+        values = sorted(x[key] for x in self.recent if x[key] is not None)
+        if not values:
+            return None
+        return values[min(int(len(values) * pct / 100), len(values) - 1)]
+
+    def summary(self):
+        times = [ x['runtime'] for x in self.recent ]
+        median = statistics.median(times) if times else 0
+        p95 = self.percentile('runtime', 95) or 0
+        inbytes = self.percentile('inbytes', 50) or 0
+        peak = self.percentile('peakbytes', 100)
+        text = f'{self.runs} runs ({self.cached} cached), median {median:.3f}s, p95 {p95:.3f}s, input {inbytes / 2**20:.1f} MB'
+        if peak is not None:
+            text += f', peak {peak / 2**20:.1f} MB'
+        return text
+
+    def histogramtext(self):
+        return '  '.join(f'<{2 ** (b + 1)}ms:{n}' for b, n in sorted(self.histogram.items()))
+
+
+class StatsLog:
+    """ Append only JSONL file rotated to .1, .2 ... once it reaches maxbytes """
+
+    def __init__(self, path, maxbytes=1 << 20, backups=3):
+        self.path = str(path)
+        self.maxbytes = maxbytes
+        self.backups = backups
+        self.lock = threading.Lock()
+
+    def rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            older = f'{self.path}.{i}'
+            if os.path.exists(older):
+                os.replace(older, f'{self.path}.{i + 1}')
+        os.replace(self.path, f'{self.path}.1')
+
+    def append(self, record):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self.lock:
+            try:
+                if os.path.getsize(self.path) + len(line) > self.maxbytes:
+                    self.rotate()
+            except OSError:   # no log yet
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as fd:
+                fd.write(line)
+
+
+class Recorder:
+
+    def __init__(self, logpath=None, sample=10):
+        self.transforms = dict()
+        self.log = StatsLog(logpath) if logpath else None
+        self.sample = sample
+        self.count = 0
+        self.active = 0          # runs between starttrace() and stoptrace()
+        self.overlapped = False  # another run started while tracing
+        self.lock = threading.Lock()
+
+    def starttrace(self):
+        """ Called as each run starts, True if it should have its allocations traced """
+        with self.lock:
+            self.count += 1
+            self.active += 1
+            if tracemalloc.is_tracing():
+                self.overlapped = True
+                return False
+            if not self.sample or self.count % self.sample or self.active > 1:
+                return False
+            self.overlapped = False
+            tracemalloc.start()
+            return True
+
+    def stoptrace(self, tracing):
+        """ Called as each run ends, the traced peak bytes or None """
+        with self.lock:
+            self.active -= 1
+            if not tracing:
+                return None
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return None if self.overlapped else peak
+
+    def add(self, run):
+        run.setdefault('when', time.time())
+        with self.lock:
+            self.transforms.setdefault(run['name'], TransformStats()).add(run)
+        if self.log is not None:
+            try:
+                self.log.append(run)
+            except OSError as exc:
+                print(f'Statistics not logged: {exc}')
+
+    def reset(self):
+        with self.lock:
+            self.transforms.clear()
+
+
+def outsize(output):
+    """ (UTF-16 bytes, lines) of a klipboard.TextResult """
+    if output is None:
+        return 0, 0
+    return 2 * output.utf16size, output.newlines + 1 if len(output) else 0
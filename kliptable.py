@@ -0,0 +1,164 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# kliptable.py - Text table parsing for KlipChop transforms.
+
+"""
+kliptable.py  - Cells of the text tables CLIs and tools print.
+
+detect() looks at the first SAMPLE lines for the table's style:
+    ascii       texttable and friends, | between cells, +---+ rules
+    markdown    | a | b | with a |---|:--:| rule under the header
+    psql        a | b with a ---+--- rule and a (N rows) footer
+    box         box drawing characters, │ between cells
+    fixed       columns lined up with spaces, eg. raidcom get port
+Without a +---+ or |---| rule the bars have to line up on every row, so a |
+inside a fixed width cell doesn't make a bar table.
+rows() then works through the lines once, dropping rules, blank lines and
+footers and yielding the cells of every other line as a list.  Fixed width
+columns are found from where the sample has spaces in every line (or from
+a ---- rule under the header), a line is split on whitespace when that gives
+the right number of cells and sliced at the columns otherwise.
+
+    style, cells = kliptable.rows(lines)
+"""
+
+import re
+
+from itertools import chain, islice
+
+
+SAMPLE = 50   # lines looked at by detect()
+
+BOXBARS = '│┃║'
+BOXRULE = frozenset('─━═┌┐└┘├┤┬┴┼╔╗╚╝╠╣╦╩╬╞╡╪╒╕╘╛╓╖╙╜╟╢╫╭╮╯╰ ' + BOXBARS)
+FOOTER = re.compile(r'\(\d+ rows?\)$')   # psql
+ESCAPEDBAR = re.compile(r'(?<!\\)\|')   # markdown cells may hold \|
+
+
+def isrule(line):
+    """ True for a line of only frame characters, with at least one - or = """
+    return not line.strip(' \t|+-=:') and ('-' in line or '=' in line)
+
+
+def isboxrule(line):
+    return BOXRULE.issuperset(line) and not BOXRULE.isdisjoint('─━═')
+
+
+def detect(sample):
+    """ The style of the table the sample lines come from """
+    lines = [ x for x in sample if x.strip() ]
+    if not lines:
+        return 'fixed'
+    if any(c in x for x in lines for c in BOXBARS):
+        return 'box'
+    rules = [ x.strip() for x in lines if isrule(x) ]
+    if any(x.startswith('+') for x in rules):   # texttable frames, a rule after every row
+        return 'ascii'
+    if any(x.startswith('|') for x in rules):
+        return 'markdown'
+    # Otherwise bars count only when they line up on every row, a | inside a
+    # fixed width cell (eg. raidcom's CVS|HDP) is somewhere else on each line:
+    rows = [ x.expandtabs() for x in lines if not isrule(x) and not FOOTER.match(x.strip()) ]
+    if not rows:
+        return 'fixed'
+    bars = set(i for i, c in enumerate(rows[0]) if c == '|')
+    for row in rows[1:]:
+        bars.intersection_update(i for i, c in enumerate(row) if c == '|')
+        if not bars:
+            return 'fixed'
+    return 'psql' if rules else 'ascii'
+
+
+def barcells(line, bar='|'):
+    """ The stripped cells between the bars of a line, outer bars optional """
+    line = line.strip()
+    if line.startswith(bar):
+        line = line[1:]
+    if line.endswith(bar) and not line.endswith('\\' + bar):
+        line = line[:-1]
+    return [ x.strip() for x in line.split(bar) ]
+
+
+def markdowncells(line):
+    if '\\|' not in line:
+        return barcells(line)
+    line = line.strip()
+    line = line[1:] if line.startswith('|') else line
+    line = line[:-1] if line.endswith('|') and not line.endswith('\\|') else line
+    return [ x.strip().replace('\\|', '|') for x in ESCAPEDBAR.split(line) ]
+
+
+def columns(sample):
+    """ (start, end) of the fixed width columns of the sample lines, the last end None """
+    lines = [ x.expandtabs() for x in sample if x.strip() ]
+    rules = [ x for x in lines if not x.strip(' -=') ]
+    if rules:   # a ---- rule under the header marks the columns out
+        lines = rules[:1]
+    else:
+        lines = [ x for x in lines if not isrule(x) ]
+    width = max(map(len, lines), default=0)
+    used = bytearray(width)
+    for line in lines:
+        for i, c in enumerate(line):
+            if c != ' ':
+                used[i] = 1
+    spans = list()
+    start = None
+    for i, flag in enumerate(used):
+        if flag and start is None:
+            start = i
+        elif not flag and start is not None:
+            spans.append([ start, i ])
+            start = None
+    if start is not None:
+        spans.append([ start, width ])
+    if not spans:
+        return [ (0, None) ]
+    # Split the gutters between neighbours, later values may stick out a little:
+    for left, right in zip(spans, spans[1:]):
+        left[1] = right[0] = (left[1] + right[0]) // 2
+    spans[0][0] = 0
+    spans[-1][1] = None
+    return [ tuple(x) for x in spans ]
+
+
+def fixedcells(line, spans):
+    cells = line.split()
+    if len(cells) == len(spans):
+        return cells
+    line = line.expandtabs()
+    return [ line[a:b].strip() for a, b in spans ]
+
+
+def rows(lines, style=None):
+    """
+    (style, generator of the cell lists of the table's rows) from its raw
+    lines, the style detected from the first SAMPLE lines unless given
+    """
+    lines = iter(lines)
+    sample = list(islice(lines, SAMPLE))
+    style = style or detect(sample)
+    return style, tablerows(chain(sample, lines), style, sample)
+
+
+def tablerows(lines, style, sample):
+    if style == 'fixed':
+        spans = columns(sample)
+        for line in lines:
+            if line.strip() and not isrule(line):
+                yield fixedcells(line, spans)
+    elif style == 'box':
+        for line in lines:
+            if line.strip() and not isboxrule(line.strip()):
+                for bar in BOXBARS[1:]:
+                    line = line.replace(bar, BOXBARS[0])
+                yield barcells(line, BOXBARS[0])
+    else:
+        split = markdowncells if style == 'markdown' else barcells
+        for line in lines:
+            if not line.strip() or isrule(line):
+                continue
+            if style == 'psql' and FOOTER.match(line.strip()):
+                continue
+            yield split(line)
@@ -55,9 +55,10 @@ hooks.load_win32clipboard = load_win32clipboard
 build_options = {
     'build_exe': 'dist',   # directory to freeze into
     'packages': ['pystray', 'OuiLookup'],
+    'includes': ['klipcore', 'klipcli', 'klipboard', 'klipcache', 'klipexec', 'kliplines', 'klipstats', 'klipdedup', 'klipsketch', 'klipnumbers', 'kliptable', 'klipcsv', 'klipcolumns', 'tkinter'],
     'zip_include_packages': '*',
-    'zip_exclude_packages': 'pystray',
-    'excludes': ['tkinter'],
+    'zip_exclude_packages': ['pystray'],
+    'excludes': ['numpy'],   # optional, tens of MB for speed on huge pastes only
     'include_files': [ 
         'klipchop.png', 
         'klipchop.ico', 
@@ -76,6 +77,7 @@ cli = 'Console' if sys.platform=='win32' else None
 
 executables = [
     Executable('KlipChop.py', base=gui, icon=__icon__),
+    Executable('KlipChop.py', base=cli, icon=__icon__, target_name='klipchop-cli'),  # for: klipchop-cli run ...
     # Executable('app2.py', base=cli),
     # Executable('app3.py', base=gui),
 ]
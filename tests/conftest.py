@@ -0,0 +1,27 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# conftest.py - pytest setup for the KlipChop tests.
+
+"""
+conftest.py  - Puts the KlipChop modules and the stock transforms on the path.
+
+    python -m pytest tests
+"""
+
+import sys
+import importlib.util
+
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def transform(name):
+    """ A stock transform module by script name """
+    spec = importlib.util.spec_from_file_location(name, ROOT / 'transforms' / f'{name}.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,26 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_calculator.py - Stream mode agrees with exact mode.
+
+import klipcore
+
+from conftest import transform
+
+
+def run(text, mode):
+    messages = list()
+    result = transform('calculator').main(klipcore.textreader(text), messages.append, {'calc-mode': mode})
+    return result, messages
+
+
+def test_stream_percentiles_match_exact():
+    exact, _ = run('1 2 3 4.5 0x10\n', 'exact')
+    stream, _ = run('1 2 3 4.5 0x10\n', 'stream')
+    assert stream == exact
+    assert 'p90: 11.400000\np95: 13.700000\np99: 15.540000\n' in exact
+
+
+def test_no_numbers_one_message():
+    for mode in ('exact', 'stream'):
+        assert run('no numbers here\n', mode) == (None, [ 'No numbers found' ])
@@ -0,0 +1,51 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_configstore.py - Debounced config writes.
+
+import threading
+
+import klipcore
+
+
+def test_exit_flush_lands_last():
+    store = klipcore.ConfigStore({'x': 0}, delay=0.01)
+    writes = list()
+    started, release = threading.Event(), threading.Event()
+    def write(snapshot, path):
+        if not started.is_set():   # the timer's write is slow
+            started.set()
+            release.wait(5)
+        writes.append(snapshot['x'])
+    store.write = write
+
+    store['x'] = 1
+    store.save()
+    timer = store.timer
+    assert started.wait(5)
+    store['x'] = 2
+    store.save()
+    exiting = threading.Thread(target=store.flush)
+    exiting.start()
+    exiting.join(0.1)   # waits for the timer's write
+    release.set()
+    exiting.join(5)
+    timer.join(5)
+    assert writes == [ 1, 2 ]
+    assert store.timer is None and not store.dirty
+
+
+def test_written_where_loaded(tmp_path, monkeypatch):
+    monkeypatch.setattr(klipcore, 'configpath', tmp_path / 'other.yaml')
+    path = tmp_path / 'test.yaml'
+    path.write_text('x: 1\n')
+    store = klipcore.ConfigStore({'x': 0, 'y': 0})
+    store.load(path)
+    assert store['x'] == 1
+    store['y'] = 2
+    store.save()
+    store.flush()
+    reread = klipcore.ConfigStore({})
+    reread.load(path)
+    assert reread == {'x': 1, 'y': 2}
+    assert not (tmp_path / 'other.yaml').exists()
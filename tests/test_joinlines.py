@@ -0,0 +1,48 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_joinlines.py - joinlines with its text options set as the tray sets them.
+
+import pytest
+
+import klipboard
+import klipcore
+
+from conftest import transform
+
+
+TEXT = 'a\nbb\n  ccc  \n\ndddd\ne\nf\n'
+
+
+def run(**options):
+    config = {'joiner': ' '}
+    config.update(options)
+    result = transform('joinlines').main(klipcore.textreader(TEXT), lambda message: None, config)
+    return ''.join(result)
+
+
+def asked(answer):
+    """ An option value the way the tray stores it, the text typed into backend.ask() """
+    backend = klipboard.MemoryBackend()
+    backend.answers.append(answer)
+    return backend.ask('Join lines in groups of', 'KlipChop', '0').strip()
+
+
+def test_join_all():
+    assert run() == 'a bb ccc  dddd e f'
+    assert run(**{'join-group': asked('0'), 'join-width': asked('')}) == 'a bb ccc  dddd e f'
+
+
+def test_group_and_width_from_asked_text():
+    assert run(**{'join-group': asked(' 3 ')}) == 'a bb ccc\ndddd e f'
+    assert run(**{'join-width': asked('8')}) == 'a bb ccc\ndddd e f'
+    assert run(**{'join-group': asked('2'), 'join-width': asked('8')}) == 'a bb\nccc dddd\ne f'
+
+
+def test_long_line_left_alone():
+    assert run(**{'join-width': 2}) == 'a\nbb\nccc\ndddd\ne\nf'
+
+
+def test_bad_number():
+    with pytest.raises(ValueError, match='join-group must be a whole number'):
+        run(**{'join-group': asked('sixteen')})
@@ -0,0 +1,84 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_klipboard.py - Cells read from spreadsheet copies through the memory backend.
+
+import io
+import csv
+
+import pytest
+
+import klipboard
+
+from klipbench import cfhtml
+
+
+# Hand made after copies of small ranges from Excel, not captured from a
+# clipboard: the text, what Excel puts in the Csv and HTML Format fragment
+# and the cells klipboard should read from them.
+SYNTHETICEXCEL = [
+    {
+        'name': 'ports',
+        'text': 'Port\tLDEV\tSize\r\nCL1-A\t00:01\t100\r\nCL2-B\t00:02\t"two\nlines"\r\n',
+        'Csv': b'Port,LDEV,Size\r\nCL1-A,00:01,100\r\nCL2-B,00:02,"two\nlines"\r\n\0',
+        'fragment': ("\r\n <col width=64 span=3 style='width:48pt'>\r\n"
+            " <tr height=20 style='height:15.0pt'>\r\n  <td height=20 width=64 style='height:15.0pt;width:48pt'>Port</td>\r\n"
+            "  <td width=64 style='width:48pt'>LDEV</td>\r\n  <td width=64 style='width:48pt'>Size</td>\r\n </tr>\r\n"
+            " <tr height=20 style='height:15.0pt'>\r\n  <td height=20 style='height:15.0pt'>CL1-A</td>\r\n"
+            "  <td>00:01</td>\r\n  <td align=right>100</td>\r\n </tr>\r\n"
+            " <tr height=40 style='height:30.0pt'>\r\n  <td height=40 style='height:30.0pt'>CL2-B</td>\r\n"
+            "  <td>00:02</td>\r\n  <td class=xl65 width=64 style='width:48pt'>two<br\r\n"
+            "    style='mso-data-placement:same-cell;' />lines</td>\r\n </tr>\r\n"),
+        'cells': [ ['Port', 'LDEV', 'Size'], ['CL1-A', '00:01', '100'], ['CL2-B', '00:02', 'two\nlines'] ],
+    },
+    {
+        'name': 'unicode',   # Ω is not in cp1252, the Csv has a ? and HTML Format is read
+        'text': 'Pool\tOwner\tUsed\r\nPool1\tΩmega &amp; co\t1,024\r\nPool2\t\t7\r\n',
+        'Csv': b'Pool,Owner,Used\r\nPool1,?mega &amp; co,"1,024"\r\nPool2,,7\r\n\0',
+        'fragment': ("\r\n <col width=64 span=3 style='width:48pt'>\r\n"
+            " <tr height=20 style='height:15.0pt'>\r\n  <td height=20 width=64 style='height:15.0pt;width:48pt'>Pool</td>\r\n"
+            "  <td width=64 style='width:48pt'>Owner</td>\r\n  <td width=64 style='width:48pt'>Used</td>\r\n </tr>\r\n"
+            " <tr height=20 style='height:15.0pt'>\r\n  <td height=20 style='height:15.0pt'>Pool1</td>\r\n"
+            "  <td>Ωmega &amp;amp; co</td>\r\n  <td class=xl66 align=right>1,024</td>\r\n </tr>\r\n"
+            " <tr height=20 style='height:15.0pt'>\r\n  <td height=20 style='height:15.0pt'>Pool2</td>\r\n"
+            "  <td></td>\r\n  <td align=right>7</td>\r\n </tr>\r\n"),
+        'cells': [ ['Pool', 'Owner', 'Used'], ['Pool1', 'Ωmega &amp; co', '1,024'], ['Pool2', '', '7'] ],
+    },
+]
+
+
+@pytest.fixture(params=SYNTHETICEXCEL, ids=lambda x: x['name'])
+def copy(request):
+    return request.param
+
+
+def test_csv_and_html(copy):
+    formats = {'Csv': copy['Csv'], 'HTML Format': cfhtml(copy['fragment'])}
+    assert klipboard.MemoryBackend(copy['text'], formats).get_cells() == copy['cells']
+
+
+def test_csv_only(copy):
+    # A Csv that lost characters is still read when there is nothing better:
+    expected = list(csv.reader(io.StringIO(copy['Csv'][:-1].decode('cp1252'), newline='')))
+    assert klipboard.MemoryBackend(copy['text'], {'Csv': copy['Csv']}).get_cells() == expected
+
+
+def test_html_only(copy):
+    assert klipboard.htmlcells(cfhtml(copy['fragment'])) == copy['cells']
+
+
+def test_no_formats():
+    assert klipboard.MemoryBackend('a\tb\r\n').get_cells() is None
+
+
+def test_getbackend(monkeypatch):
+    assert isinstance(klipboard.getbackend('memory', 'text'), klipboard.MemoryBackend)
+    with pytest.raises(ValueError, match='Unknown clipboard backend'):
+        klipboard.getbackend('nosuch')
+
+    class Broken(klipboard.MemoryBackend):
+        def __init__(self):
+            raise KeyError('setting')
+    monkeypatch.setitem(klipboard.backends, 'broken', Broken)
+    with pytest.raises(KeyError, match='setting'):
+        klipboard.getbackend('broken')
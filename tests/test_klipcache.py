@@ -0,0 +1,64 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_klipcache.py - Result cache keys and which runs are cached.
+
+import pytest
+
+import klipboard
+import klipcache
+import klipcore
+
+from conftest import transform
+
+
+def test_cells_in_key():
+    cache = klipcache.ResultCache(1 << 20)
+    text = 'Pool1\t1,024\r\n'
+    plain = cache.basekey(text, __file__)
+    cells = cache.basekey(text, __file__, cells=[ ['Pool1', '1,024'] ])
+    other = cache.basekey(text, __file__, cells=[ ['Pool1', '1', '024'] ])
+    assert len({ plain, cells, other }) == 3
+    assert cells == cache.basekey(text, __file__, cells=[ ['Pool1', '1,024'] ])
+
+
+@pytest.fixture
+def clipboard(monkeypatch):
+    """ A fresh result cache and an in-memory clipboard for klipcore.runtransform """
+    monkeypatch.setattr(klipcore, 'cache', None)
+    monkeypatch.setattr(klipcore, 'recorder', None)
+    monkeypatch.setitem(klipcore.config, 'cache-size', 1)
+    monkeypatch.setattr(klipcore, 'backend', klipboard.MemoryBackend())
+    return klipcore.backend
+
+
+def test_cached(clipboard, monkeypatch):
+    monkeypatch.setitem(klipcore.config, 'hexprefix', False)
+    module = transform('dec2hex')
+    for _ in range(2):
+        clipboard.set_text('255\n')
+        klipcore.runtransform(module, lambda message: None)
+        assert clipboard.get_text() == ' ff\n'
+    assert klipcore.cache.hits == 1
+
+
+def test_calculator_saves_every_run(clipboard, tmp_path, monkeypatch):
+    state = tmp_path / 'state.json'
+    monkeypatch.setitem(klipcore.config, 'calc-mode', 'stream')
+    monkeypatch.setitem(klipcore.config, 'calc-save', str(state))
+    module = transform('calculator')
+    for _ in range(2):
+        clipboard.set_text('1 2 3\n')
+        klipcore.runtransform(module, lambda message: None)
+        assert state.is_file()
+        state.unlink()
+    assert klipcore.cache is None   # never looked up
+
+
+def test_uncacheable_not_hashed(clipboard, monkeypatch):
+    def basekey(*args, **kwargs):
+        raise AssertionError('hashed')
+    monkeypatch.setattr(klipcache.ResultCache, 'basekey', basekey)
+    clipboard.set_text('1 2 3\n')
+    klipcore.runtransform(transform('calculator'), lambda message: None)
+    assert clipboard.get_text().startswith('Count: 3\n')
@@ -0,0 +1,39 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_klipcli.py - Headless runs end their output with a newline and write nothing to ~/.KlipChop.
+
+import pytest
+
+import klipcli
+import klipcore
+
+from conftest import ROOT
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('USERPROFILE', str(tmp_path))
+    monkeypatch.setattr(klipcore, 'getprogdir', lambda: ROOT)
+    for name in ('progdir', 'configdir', 'configpath'):
+        monkeypatch.setattr(klipcore, name, getattr(klipcore, name))
+    monkeypatch.setattr(klipcore.config, 'path', klipcore.config.path)
+    return tmp_path
+
+
+@pytest.mark.parametrize('text', [ 'b\na\nb', 'b\na\nb\n' ])
+def test_ends_with_newline(home, text, capsys):
+    infile = home / 'in.txt'
+    infile.write_text(text)
+    assert klipcli.main([ 'uniquelines', str(infile), '-s', 'sort=false' ]) == 0
+    assert capsys.readouterr().out == 'b\na\n'
+    outfile = home / 'out.txt'
+    assert klipcli.main([ 'csv2lines', str(infile), '-o', str(outfile), '-s', 'sort=false' ]) == 0
+    assert outfile.read_text() == 'b\na\n'
+
+
+def test_nothing_written(home, capsys):
+    assert klipcli.main([ '--list' ]) == 0
+    assert 'uniquelines' in capsys.readouterr().out
+    assert not (home / '.KlipChop').exists()
@@ -0,0 +1,74 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_klipcolumns.py - Select, sort and group, over NumPy arrays and plain lists.
+
+import pytest
+
+import klipcore
+import klipcolumns
+
+from conftest import transform
+
+
+TABLE = 'Pool,LDEV,Size\nP1,007,10\nP2,002,5\nP1,003,20\nP2,004,\n'
+
+
+@pytest.fixture(params=[ 'numpy', 'python' ], autouse=True)
+def path(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(klipcolumns, 'numpy', None)
+    return request.param
+
+
+def run(name, text, **options):
+    config = {'separator': ',', 'sort': False}
+    config.update(options)
+    messages = list()
+    result = transform(name).main(klipcore.textreader(text), messages.append, config)
+    return (''.join(result) if result is not None else None), messages
+
+
+def test_select_specs():
+    table = klipcolumns.load(klipcore.textreader(TABLE), ',')
+    assert table.header and len(table) == 4
+    assert table.select('1,3') == table.select('pool, SIZE') == [ 0, 2 ]
+    assert table.select('2-3') == [ 1, 2 ]
+    with pytest.raises(ValueError, match='No column'):
+        table.select('4')
+
+
+def test_columnselect():
+    text, _ = run('columnselect', TABLE, columns='LDEV,Pool')
+    assert text.splitlines() == [ 'LDEV,Pool', '007,P1', '002,P2', '003,P1', '004,P2' ]
+
+
+def test_columnsort():
+    text, _ = run('columnsort', 'Pool,Size\nP1,10\nP2,5\nP1,20\nP3,100\n', **{'sort-columns': 'Pool,-Size'})
+    assert text.splitlines() == [ 'Pool,Size', 'P1,20', 'P1,10', 'P2,5', 'P3,100' ]
+    text, _ = run('columnsort', 'Pool,Size\nP1,10\nP2,5\nP3,100\n', **{'sort-columns': 'Size'})
+    assert text.splitlines() == [ 'Pool,Size', 'P2,5', 'P1,10', 'P3,100' ]   # by value, not text
+
+
+def test_columngroup():
+    text, messages = run('columngroup', TABLE, **{'group-columns': 'Pool'})
+    assert text.splitlines() == [ 'Pool,count', 'P1,2', 'P2,2' ]
+    assert messages == [ '4 rows in 2 groups.' ]
+    for how, expected in (('sum', [ '30', '5' ]), ('min', [ '10', '5' ]), ('max', [ '20', '5' ]), ('mean', [ '15', '5' ])):
+        text, _ = run('columngroup', TABLE, **{'group-columns': 'Pool', 'group-values': 'Size', 'group-aggregate': how})
+        assert text.splitlines()[1:] == [ f'P1,{expected[0]}', f'P2,{expected[1]}' ], how
+
+
+def test_int64_sum_exact():
+    big = 2**62
+    text, _ = run('columngroup', f'Pool,Size\nP1,{big}\nP1,{big}\nP1,{big}\nP2,1\n',
+        **{'group-columns': 'Pool', 'group-values': 'Size', 'group-aggregate': 'sum'})
+    assert text.splitlines()[1:] == [ f'P1,{3 * big}', 'P2,1' ]
+
+
+@pytest.mark.parametrize('name', [ 'columnselect', 'columnsort', 'columngroup' ])
+@pytest.mark.parametrize('text', [ '', '  \n\n' ])
+def test_no_table(name, text):
+    assert run(name, text) == (None, [ 'No table found' ])
@@ -0,0 +1,32 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_klipcsv.py - The shared CSV reader keeps the line based scripts' output.
+
+import klipcore
+import klipcsv
+
+from conftest import transform
+
+
+CONFIG = {'separator': ',', 'sort': False, 'table-align': 'left'}
+
+
+def run(name, text):
+    result = transform(name).main(klipcore.textreader(text), lambda message: None, dict(CONFIG))
+    return result if isinstance(result, list) else ''.join(result)
+
+
+def test_cells_stripped_blank_rows_kept():
+    _, rows = klipcsv.rows(klipcore.textreader('a, b ,"  c  "\n\n   \nd\n'), ',')
+    assert list(rows) == [ ['a', 'b', 'c'], [''], [''], ['d'] ]
+
+
+def test_csv2lines_as_before():
+    # One '' for the blank lines, as the line split version gave:
+    assert run('csv2lines', '  c  \na,b\n\nx,  y\n\na\n') == [ 'c', 'a', 'b', '', 'x', 'y' ]
+
+
+def test_csv2table_skips_blank_lines():
+    table = run('csv2table', 'a,b\n\n1,2\n')
+    assert table.count('+') == 9   # one table, three rules of three corners
@@ -0,0 +1,74 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_klipdedup.py - The disk paths give what the dict path gives.
+
+import random
+import types
+
+import pytest
+
+import klipcore
+import klipdedup
+
+from conftest import transform
+
+
+def lines(count, distinct, seed=1):
+    rng = random.Random(seed)
+    return [ f'LDEV 00:{rng.randrange(distinct):04X} é' for _ in range(count) ]
+
+
+ITEMS = lines(5000, 800)
+EXPECTED = list(dict.fromkeys(ITEMS))
+
+
+def test_in_budget_is_a_list():
+    assert klipdedup.unique(ITEMS, 1 << 30) == EXPECTED
+
+
+@pytest.fixture
+def partitions(monkeypatch):
+    monkeypatch.setattr(klipdedup, 'PARTITIONS', 4)   # fewer files, partitions over budget sooner
+
+
+def test_spilled_order():
+    result = klipdedup.unique(ITEMS, 20000)
+    assert isinstance(result, types.GeneratorType)
+    assert list(result) == EXPECTED
+
+
+@pytest.mark.parametrize('budget', [ 20000, 2000, 200 ])   # 200 splits partitions again to MAXDEPTH
+def test_repartitioned_order(budget, partitions):
+    result = klipdedup.unique(ITEMS, budget)
+    assert isinstance(result, types.GeneratorType)
+    assert list(result) == EXPECTED
+
+
+def test_spilled_sort(partitions):
+    assert list(klipdedup.sort(klipdedup.unique(ITEMS, 2000), 2000)) == sorted(EXPECTED)
+    assert list(klipdedup.sort(iter(ITEMS), 2000)) == sorted(ITEMS)
+
+
+def test_joined():
+    counts = list()
+    text = ''.join(klipdedup.joined(iter(EXPECTED), '\n', counts.append))
+    assert text == '\n'.join(EXPECTED) and counts == [ len(EXPECTED) ]
+
+
+def run(name, text, **options):
+    config = {'separator': ',', 'sort': False}
+    config.update(options)
+    messages = list()
+    result = transform(name).main(klipcore.textreader(text), messages.append, config)
+    if isinstance(result, list):
+        result = '\n'.join(result)
+    return ''.join(result), messages
+
+
+@pytest.mark.parametrize('sort', [ False, True ])
+def test_transforms_match_dict_path(sort, partitions):
+    text = '\n'.join(ITEMS)
+    for name in ('uniquelines', 'lines2csv'):
+        tiny = run(name, text, sort=sort, **{'dedup-memory': 0.002})   # about 2KB
+        assert tiny == run(name, text, sort=sort), name
@@ -0,0 +1,80 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_klipexec.py - The engine picked for a run, and each gives what running main() inline gives.
+
+import types
+
+import pytest
+
+import klipboard
+import klipcache
+import klipcore
+import klipexec
+
+from conftest import ROOT
+
+
+def script(name):
+    return str(ROOT / 'transforms' / f'{name}.py')
+
+
+def settings(**options):
+    config = klipcache.RecordingConfig(klipcore.config)
+    config.update({'sort': False, 'hexprefix': True})
+    config.update(options)
+    return config
+
+
+def run(module, data, engine=klipcore.inlineengine, **options):
+    messages = list()
+    result = engine(module, data, messages.append, settings(**options))
+    return ''.join(klipboard.chunks(result)), messages
+
+
+@pytest.fixture
+def thresholds(monkeypatch):
+    monkeypatch.setitem(klipcore.config, 'stream-lines', 10)
+    monkeypatch.setitem(klipcore.config, 'process-lines', 100)
+
+
+def lines(count):
+    return ''.join(f'LDEV {i} size {i * 3}\n' for i in range(count))[:-1]
+
+
+def test_chooseengine(thresholds):
+    dec2hex = klipcore.getmodule(script('dec2hex'))
+    calculator = klipcore.getmodule(script('calculator'))
+    csv2table = klipcore.getmodule(script('csv2table'))
+    cpubound = types.SimpleNamespace(CAPABILITIES={'streaming', 'cpu_bound'})
+    cases = [
+        (dec2hex, 9, klipcore.inlineengine),
+        (dec2hex, 10, klipcore.streamengine),
+        (dec2hex, 99, klipcore.streamengine),
+        (dec2hex, 100, klipexec.parallelengine),
+        (calculator, 100, klipcore.streamengine),   # needs_full_input, streamed but never split
+        (csv2table, 100, klipcore.inlineengine),    # makes two passes
+        (cpubound, 9, klipcore.inlineengine),
+        (cpubound, 10, klipexec.processengine),
+    ]
+    for module, count, engine in cases:
+        assert klipexec.chooseengine(module, lines(count)) is engine, (module, count)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setitem(klipcore.config, 'processes', 2)
+    monkeypatch.setattr(klipexec, 'CHUNKSIZE', 1000)   # several chunks in flight
+    klipexec.shutdownpool()
+    yield
+    klipexec.shutdownpool()
+
+
+@pytest.mark.parametrize('name', [ 'dec2hex', 'hex2dec' ])
+def test_engines_match_inline(name, pool):
+    module = klipcore.getmodule(script(name))
+    data = lines(3000) + '\n0x1f 0b101\n\n  spaced  \r\n'
+    inline = run(module, data)
+    assert inline[0] != data
+    assert run(module, data, klipcore.streamengine) == inline
+    assert run(module, data, klipexec.parallelengine) == inline
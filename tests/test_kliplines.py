@@ -0,0 +1,57 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_kliplines.py - LineIndex and the one pass readers split as splitlines() and strip() do.
+
+import pytest
+
+import kliplines
+
+
+TEXTS = [
+    '',
+    '\n',
+    '\n\n',
+    'a',
+    'a\n',
+    '  a  \r\n\r\n\tb\t\r\n',
+    'no end \r\n  last  ',
+    'cr\rlf\nvt\x0bff\x0csep end\r\n',
+    '\r\n'.join(f' line {i} ' for i in range(200)) + '\r\n',
+]
+
+
+def expected(text):
+    return [ x.strip() for x in text.splitlines() ]
+
+
+@pytest.fixture(params=[ kliplines.BLOCKSIZE, 7 ], ids=[ 'block', 'tinyblocks' ])
+def blocksize(request, monkeypatch):
+    monkeypatch.setattr(kliplines, 'BLOCKSIZE', request.param)
+    monkeypatch.setattr(kliplines.blocks, '__defaults__', (request.param,))
+    return request.param
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_lineindex(text, blocksize):
+    index = kliplines.LineIndex(text)
+    lines = expected(text)
+    assert len(index) == len(lines)
+    assert list(index) == lines
+    assert list(index) == lines   # any number of passes
+    assert [ index[i] for i in range(len(index)) ] == lines
+    assert index[1:3] == lines[1:3]
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_iterlines(text, blocksize):
+    assert list(kliplines.iterlines(text)) == expected(text)
+    assert ''.join(kliplines.iterlines(text, keepends=True)) == text
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_rawlines(text):
+    for size in (1, 3, len(text) or 1):
+        pieces = [ text[i:i + size] for i in range(0, len(text), size) ]
+        assert list(kliplines.rawlines(pieces)) == text.splitlines()
+        assert ''.join(kliplines.rawlines(pieces, keepends=True)) == text
@@ -0,0 +1,61 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_klipnumbers.py - The number scanner and the base conversions built on it.
+
+import klipcore
+import klipnumbers
+
+from conftest import transform
+
+
+LINE = 'port 1A at 0x1f and 50:06:0e:80:07:dc:88:a0 E790 cafe 0b101 12 1.5'
+
+
+def kinds(text):
+    return [ (x.lastgroup, x.group()) for x in klipnumbers.TOKEN.finditer(text) ]
+
+
+def test_token_kinds():
+    assert kinds(LINE) == [
+        ('barehex', '1A'), ('hex', '0x1f'), ('bytes', '50:06:0e:80:07:dc:88:a0'),
+        ('barehex', 'E790'), ('binary', '0b101'), ('decimal', '12'), ('float', '1.5') ]
+
+
+def test_token_words():
+    # cafe has no digit, a hex word inside a longer word is not one:
+    assert [ kind for kind, _ in kinds('cafe x1A 1Ax') ] == [ 'decimal', 'decimal' ]
+    # A MAC is a byte string, two bytes are not:
+    assert kinds('00-1b-63-84-45-e6 00:1b') == [
+        ('bytes', '00-1b-63-84-45-e6'), ('decimal', '00'), ('barehex', '1b') ]
+
+
+def run(name, text, **options):
+    config = {'hexprefix': False}
+    config.update(options)
+    messages = list()
+    result = transform(name).main(klipcore.textreader(text), messages.append, config)
+    return ''.join(result), messages
+
+
+def test_hex2dec_default():
+    # 0x numbers were never converted by the old pattern, names and WWNs are left alone:
+    text, messages = run('hex2dec', LINE)
+    assert text == 'port 1A at   31 and 50:06:0e:80:07:dc:88:a0 E790 cafe     5 12 1.5'
+    assert messages == [ 'Converted 2 numbers to decimal' ]
+
+
+def test_hex2dec_words():
+    text, _ = run('hex2dec', LINE, **{'hex-words': True})
+    assert text == 'port 26 at   31 and     5766312315944994976 59280 cafe     5 12 1.5'
+
+
+def test_hex2dec_mapline():
+    module = transform('hex2dec')
+    assert module.mapline('1A 0x1A\n', {}) == ('1A   26\n', 1)
+    assert module.mapline('1A 0x1A\n', {'hex-words': True}) == ('26   26\n', 2)
+
+
+def test_dec2hex():
+    text, _ = run('dec2hex', 'LDEV 255 in 1A at 0x10\n', hexprefix=True)
+    assert text == 'LDEV 0xff in 1A at 0x10\n'
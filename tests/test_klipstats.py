@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_klipstats.py - Run statistics, the JSONL log and memory tracing.
+
+import json
+
+import klipstats
+
+
+def run(name='uniquelines', runtime=0.01, **fields):
+    record = {'name': name, 'cached': False, 'runtime': runtime, 'inbytes': 2048, 'peakbytes': None}
+    record.update(fields)
+    return record
+
+
+def test_rolling_window():
+    recorder = klipstats.Recorder()
+    for i in range(klipstats.WINDOW + 50):
+        recorder.add(run(runtime=i / 1000, cached=i < 10))
+    stats = recorder.transforms['uniquelines']
+    assert stats.runs == klipstats.WINDOW + 50 and stats.cached == 10
+    assert len(stats.recent) == klipstats.WINDOW
+    assert stats.recent[0]['runtime'] == 0.05   # the oldest 50 have gone
+    assert stats.summary().startswith('150 runs (10 cached), median 0.100s, p95 0.145s')
+
+
+def test_histogram():
+    stats = klipstats.TransformStats()
+    for runtime in (0.0001, 0.001, 0.0015, 0.003, 0.1, 0.1):
+        stats.add(run(runtime=runtime))
+    assert stats.histogram == { 0: 3, 1: 1, 6: 2 }   # <2ms, <4ms, <128ms
+    assert stats.histogramtext() == '<2ms:3  <4ms:1  <128ms:2'
+
+
+def test_log_rotation(tmp_path):
+    path = tmp_path / 'logs' / 'stats.jsonl'
+    log = klipstats.StatsLog(path, maxbytes=500, backups=2)
+    for i in range(40):
+        log.append(run(runtime=i))
+    assert sorted(x.name for x in path.parent.iterdir()) == [ 'stats.jsonl', 'stats.jsonl.1', 'stats.jsonl.2' ]
+    records = [ json.loads(x) for x in path.read_text().splitlines() ]
+    assert records[-1]['runtime'] == 39 and path.stat().st_size <= 500
+    older = [ json.loads(x)['runtime'] for x in (tmp_path / 'logs' / 'stats.jsonl.1').read_text().splitlines() ]
+    assert older[-1] == records[0]['runtime'] - 1
+
+
+def test_trace_alone():
+    recorder = klipstats.Recorder(sample=1)
+    tracing = recorder.starttrace()
+    data = [ bytearray(100) for _ in range(10000) ]
+    assert tracing and recorder.stoptrace(tracing) > 1 << 20
+    del data
+
+
+def test_trace_overlapped():
+    recorder = klipstats.Recorder(sample=1)
+    first = recorder.starttrace()
+    second = recorder.starttrace()   # a worker thread starts another run
+    assert first and not second
+    assert recorder.stoptrace(second) is None
+    assert recorder.stoptrace(first) is None   # its peak holds the other run's memory
+    busy = recorder.starttrace()
+    assert not recorder.starttrace()   # not traced while another run is going
+    recorder.stoptrace(False)
+    recorder.stoptrace(busy)
+    assert recorder.active == 0
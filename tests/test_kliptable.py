@@ -0,0 +1,60 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_kliptable.py - Table style detection and the CSV round trip.
+
+import klipcore
+import kliptable
+
+from conftest import transform
+
+
+CONFIG = {'separator': ',', 'table-align': 'left'}
+CSV = 'LDEV,Pool,Port,Capacity\n00:01,Pool1,CL1-A,100\n00:02,Pool2,CL1-A,250.5\n00:04,Pool3,CL1-A,\n'
+
+
+def run(name, text, config=CONFIG):
+    messages = list()
+    result = transform(name).main(klipcore.textreader(text), messages.append, dict(config))
+    result = result if isinstance(result, str) else ''.join(result)
+    return result, messages
+
+
+def test_csv2table_round_trip():
+    table, _ = run('csv2table', CSV)
+    assert kliptable.detect(table.splitlines()) == 'ascii'
+    back, messages = run('table2csv', table)
+    assert back == CSV.rstrip('\n')
+    assert messages == [ 'Table (ascii) converted into 4 CSV rows.' ]
+
+
+def test_texttable_frame():
+    lines = [
+        '+------+-------+',
+        '| Port | WWN   |',
+        '+======+=======+',
+        '| CL1- | 50060 |',
+        '| A    | e80   |',
+        '+------+-------+',
+        '| CL2- | 50060 |',
+        '+------+-------+',
+    ]
+    assert kliptable.detect(lines) == 'ascii'
+
+
+def test_raidcom_bar_in_cell_is_fixed():
+    lines = [
+        'LDEV#  VOL_TYPE      ATTRIBUTE      POOL_ID',
+        '   0   OPEN-V-CVS    CVS|HDP              1',
+        '   1   OPEN-V-CVS    CVS                  1',
+        '  10   OPEN-V-CVS    CVS|HDP|ALUA         2',
+    ]
+    style, rows = kliptable.rows(lines)
+    assert style == 'fixed'
+    assert list(rows)[1:] == [ ['0', 'OPEN-V-CVS', 'CVS|HDP', '1'], ['1', 'OPEN-V-CVS', 'CVS', '1'],
+        ['10', 'OPEN-V-CVS', 'CVS|HDP|ALUA', '2'] ]
+
+
+def test_bar_styles():
+    assert kliptable.detect([ '| a | b |', '|---|:-:|', '| 1 | 2 |' ]) == 'markdown'
+    assert kliptable.detect([ ' a | b ', '---+---', ' 1 | 2 ', '(1 row)' ]) == 'psql'
@@ -0,0 +1,20 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_loadmenus.py - Menu options are swapped in, never changed in place.
+
+import klipcore
+
+from conftest import ROOT
+
+
+def test_options_swapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(klipcore, 'progdir', ROOT)
+    monkeypatch.setattr(klipcore, 'configdir', tmp_path)
+    for reload in ('parsed', 'manifest'):
+        before = klipcore.menuoptions
+        snapshot = list(before)
+        klipcore.loadmenus()
+        assert klipcore.menuoptions is not before, reload
+        assert before == snapshot, reload   # a tray reading the old list sees it whole
+        assert klipcore.menuoptions
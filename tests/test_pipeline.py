@@ -0,0 +1,44 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# test_pipeline.py - A pipe: entry gives what running its stages one after another gives.
+
+import klipboard
+import klipcache
+import klipcore
+
+from conftest import ROOT
+
+
+def script(name):
+    return str(ROOT / 'transforms' / f'{name}.py')
+
+
+def run(module, data):
+    messages = list()
+    config = klipcache.RecordingConfig(klipcore.config)
+    config['sort'] = False
+    result = klipcore.inlineengine(module, data, messages.append, config)
+    return ''.join(klipboard.chunks(result)), messages
+
+
+TABLE = '''+------+-------+
+| Port | WWN   |
++======+=======+
+| CL1  | 50:06 |
++------+-------+
+| CL2  | 50:06 |
++------+-------+
+| CL1  | 50:07 |
++------+-------+
+'''
+
+
+def test_pipeline_matches_stages():
+    stages = [ 'table2csv', 'csv2lines', 'uniquelines' ]
+    pipeline = klipcore.loadmodule(klipcore.PIPEPREFIX + '|'.join(map(script, stages)))
+    text = TABLE
+    for name in stages:
+        text, messages = run(klipcore.getmodule(script(name)), text)
+    assert run(pipeline, TABLE) == (text, messages)
+    assert text == 'Port\nWWN\nCL1\n50:06\nCL2\n50:07'
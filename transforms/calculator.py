@@ -2,45 +2,78 @@
 # -*- coding: utf-8 -*-
 # KlipChop menu function
 
+import json
 import locale
-import re
+
+from itertools import islice
+
+import klipnumbers
 
 
 # All kllipchop customizable modules must have a main function
 # The main function is passed three variables:
-#   textlines   - Generator of clipboard lines
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
 #   messagefunc - function to call with notification
 #   config      - configuration dictionary
 # The main function should return a string object or a list of strings
 
+CAPABILITIES = {'streaming', 'needs_full_input', 'cells'}
+CACHEABLE = False   # calc-merge and calc-save are files the result cache can't see
+
+BATCHLINES = 65536   # lines scanned at a time in stream mode
+
+
 def main(textlines, messagefunc, config):
     """
     KlipChop func to sum up etc numbers
+    config['calc-mode'] is exact, or stream to summarise the numbers a batch
+    of lines at a time in constant memory with estimated median and
+    percentiles.  In stream mode config['calc-merge'] names saved states
+    (a file or list of files) to add in and config['calc-save'] a file to
+    save the combined state to.  A spreadsheet copy is read from its cells.
     """
     dp = locale.localeconv()['decimal_point']
-    pattern = re.compile(f'(0x[\da-f]+|\d+\.?\d*|\.\d+)', re.IGNORECASE)
-
-    def numfinder(dp=None):
-        for line in textlines():
-            if dp:
-                line = line.replace(dp, '.')   # change from locale decimal sep to normnal
-
-            m = pattern.findall(line)
-            for n in m:
-                if '.' in n:
-                    yield float(n)
-                elif n.lower().startswith('0x'):
-                    yield int(n, 16)
-                else:
-                    yield int(n)
-
-    numbers = list(numfinder())  # try looking for normal first
-    if not numbers and dp != '.':   # else try using locale decimal point
-        numbers = list(numfinder(dp))
-
-    count = len(numbers)
-    tot = sum(numbers)
-    mean = tot / count if count > 0 else 0
-    result = f'Count: {count:,d}\nsum: {tot:,f}\naverage: {mean:,f}\nmin: {min(numbers):,f}\nmax: {max(numbers):,f}\n'
+    cells = textlines('cells')
+    if config.get('calc-mode', 'exact') == 'stream':
+        stats = streamed(textlines, messagefunc, config, dp)
+    elif cells is not None:
+        stats = klipnumbers.statistics(*klipnumbers.extractcells(cells, dp))
+    else:
+        text = ''.join(textlines('rawtext'))   # one scan of the whole clipboard
+        stats = klipnumbers.statistics(*klipnumbers.extract(text, dp))
+    if stats is None:
+        messagefunc('No numbers found')
+        return None   # the clipboard is left as it was
+
+    result = (f'Count: {stats["count"]:,d}\nsum: {stats["sum"]:,f}\naverage: {stats["mean"]:,f}\n'
+              f'min: {stats["min"]:,f}\nmax: {stats["max"]:,f}\n'
+              f'median: {stats["median"]:,f}\nstdev: {stats["stdev"]:,f}\n'
+              f'p90: {stats["p90"]:,f}\np95: {stats["p95"]:,f}\np99: {stats["p99"]:,f}\n')
     messagefunc(result)
     return result
+
+
+def streamed(textlines, messagefunc, config, dp):
+    """ statistics of the lines plus any merged states, saving the result if asked """
+    running = klipnumbers.Running()
+    cells = textlines('cells')
+    if cells is not None:
+        for start in range(0, len(cells), BATCHLINES):
+            running.update(*klipnumbers.extractcells(cells[start:start + BATCHLINES], dp))
+    else:
+        lines = iter(textlines())
+        while batch := list(islice(lines, BATCHLINES)):
+            running.update(*klipnumbers.extract('\n'.join(batch), dp))
+
+    merges = config.get('calc-merge') or []
+    for path in [ merges ] if isinstance(merges, str) else merges:
+        with open(path, encoding='utf-8') as fd:
+            running.merge(klipnumbers.Running.fromstate(json.load(fd)))
+    if config.get('calc-save'):
+        with open(config['calc-save'], 'w', encoding='utf-8') as fd:
+            json.dump(running.state(), fd)
+        messagefunc(f'Calculator state saved to {config["calc-save"]}')
+    return running.statistics()
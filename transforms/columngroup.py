@@ -0,0 +1,54 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# KlipChop menu function
+
+import klipcsv
+import klipcolumns
+
+
+# All kllipchop customizable modules must have a main function
+# The main function is passed three variables:
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
+#   messagefunc - function to call with notification
+#   config      - configuration dictionary
+# The main function should return a string object or a list of strings
+
+CAPABILITIES = {'streaming', 'needs_full_input', 'cells'}
+
+
+def main(textlines, messagefunc, config):
+    """
+    KlipChop func to group the rows of a table and aggregate each group
+    config['group-columns'] names the columns to group by and
+    config['group-values'] the ones to aggregate with
+    config['group-aggregate']: count, sum, min, max or mean.  Groups are
+    listed in order of first appearance, or by size with count.
+    """
+    table = klipcolumns.load(textlines, config['separator'])
+    if not table.names:
+        messagefunc('No table found')
+        return None
+    keys = table.select(config.get('group-columns', '1'))
+    how = config.get('group-aggregate', 'count')
+    values = table.select(config.get('group-values', '')) if how != 'count' else []
+    if how != 'count' and not values:
+        raise ValueError(f'Set the columns to {how} in Options')
+
+    ids, groups = klipcolumns.groupids(table, keys)
+    header = [ table.names[i] for i in keys ]
+    results = list()
+    if how == 'count':
+        header.append('count')
+        results.append(klipcolumns.aggregate(None, ids, len(groups), 'count'))
+    for i in values:
+        header.append(f'{how}({table.names[i]})')
+        results.append(klipcolumns.aggregate(table.values(i), ids, len(groups), how))
+
+    rows = [ [ *key, *map(klipcolumns.celltext, aggs) ] for key, aggs in zip(groups, zip(*results)) ]
+    if how == 'count' and config['sort']:
+        rows.sort(key=lambda x: int(x[-1]), reverse=True)
+    messagefunc(f'{len(table):,d} rows in {len(groups):,d} groups.')
+    return klipcsv.chunks([ header ] + rows, config['separator'])
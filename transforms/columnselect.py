@@ -0,0 +1,33 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# KlipChop menu function
+
+import klipcsv
+import klipcolumns
+
+
+# All kllipchop customizable modules must have a main function
+# The main function is passed three variables:
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
+#   messagefunc - function to call with notification
+#   config      - configuration dictionary
+# The main function should return a string object or a list of strings
+
+CAPABILITIES = {'streaming', 'needs_full_input', 'cells'}
+
+
+def main(textlines, messagefunc, config):
+    """
+    KlipChop func to keep only some columns of a table
+    config['columns'] names them, eg. 1,3 or Port,Size or 2-4
+    """
+    table = klipcolumns.load(textlines, config['separator'])
+    if not table.names:
+        messagefunc('No table found')
+        return None
+    indexes = table.select(config.get('columns', '1'))
+    return klipcsv.chunks(table.rows(indexes), config['separator'],
+        lambda count: messagefunc(f'{len(indexes)} of {len(table.names)} columns kept for {len(table):,d} rows.'))
@@ -0,0 +1,42 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# KlipChop menu function
+
+import klipcsv
+import klipcolumns
+
+
+# All kllipchop customizable modules must have a main function
+# The main function is passed three variables:
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
+#   messagefunc - function to call with notification
+#   config      - configuration dictionary
+# The main function should return a string object or a list of strings
+
+CAPABILITIES = {'streaming', 'needs_full_input', 'cells'}
+
+
+def main(textlines, messagefunc, config):
+    """
+    KlipChop func to sort a table by one or more columns
+    config['sort-columns'] names them most significant first, a - in front
+    sorts that one in descending order, eg. Pool,-Size.  Numeric columns
+    sort by value, the header stays on top.
+    """
+    table = klipcolumns.load(textlines, config['separator'])
+    if not table.names:
+        messagefunc('No table found')
+        return None
+    keys = list()
+    for part in str(config.get('sort-columns', '1')).split(','):
+        part = part.strip()
+        descending = part.startswith('-') and part.lower() not in (x.lower() for x in table.names)
+        for i in table.select(part[1:] if descending else part):
+            keys.append((i, descending))
+    order = klipcolumns.sortorder(table, keys)
+    columns = range(len(table.names))
+    return klipcsv.chunks(table.rows(columns, order), config['separator'],
+        lambda count: messagefunc(f'{len(table):,d} rows sorted by {len(keys)} column{"s" if len(keys) != 1 else ""}.'))
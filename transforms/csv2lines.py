@@ -2,29 +2,36 @@
 # -*- coding: utf-8 -*-
 # KlipChop menu function
 
+import klipcsv
+
 
 # All kllipchop customizable modules must have a main function
 # The main function is passed three variables:
-#   textlines   - Generator of clipboard lines
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
 #   messagefunc - function to call with notification
 #   config      - configuration dictionary
 # The main function should return a string object or a list of strings
 
+CAPABILITIES = {'cells'}
+
+
 def main(textlines, messagefunc, config):
     """
     KlipChop func to to convert CSV into seperate lines
     """
     result = list()
-    count = 0
-    for line in textlines():
-        if line not in result:
-            result.extend(line.split(config['separator']))
-            count += 1
-    
+    fields = set()   # what is in result, for the check below
+    _, rows = klipcsv.rows(textlines, config['separator'])
+    for cells in rows:
+        if len(cells) > 1 or cells[0] not in fields:
+            result.extend(cells)
+            fields.update(cells)
+
     if config['sort']:
         result = sorted(result)
-    count = len(result) 
-    result = '\n'.join(result)
+    count = len(result)
     messagefunc(f'Text converted into {count} lines.')
     return result
-
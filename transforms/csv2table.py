@@ -2,58 +2,93 @@
 # -*- coding: utf-8 -*-
 # KlipChop menu function
 
-import texttable
+import io
+import re
 
-# def make_table (table, frameH = '-', frameV = '|', frameX = '+'):
-#     cols = [list(x) for x in zip(*table)]
-#     lengths = [max(map(len, map(str, col))) for col in cols]
-#     f = frameV + frameV.join(' {:>%d} ' % l for l in lengths) + frameV
-#     s = frameX + frameX.join(frameH * (l+2) for l in lengths) + frameX
+from itertools import islice
 
-#     output = StringIO()
-#     output.write(s)
-#     for row in table:
-#         output.write(f.format(*row))
-#         output.write(s)
-#     return output
+import klipcsv
 
 
 # All kllipchop customizable modules must have a main function
 # The main function is passed three variables:
-#   textlines   - Generator of clipboard lines
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
 #   messagefunc - function to call with notification
 #   config      - configuration dictionary
 # The main function should return a string object or a list of strings
 
+CAPABILITIES = {'cells'}
+
+NUMERIC = re.compile(r'[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?%?|0[xX][\da-fA-F]+')
+ALIGN = {'left': '<', 'right': '>', 'center': '^'}
+
+
+def layout(rows, numeric):
+    """
+    First pass, the tables the rows make up (a new one starts whenever the
+    number of columns changes) as [columns, rows, widths, indexes of the
+    columns holding only numbers (when numeric)]
+    """
+    tables = list()
+    table = None
+    for cols in rows:
+        if table is None or table[0] != len(cols):
+            table = [ len(cols), 0, [ 0 ] * len(cols), list(range(len(cols))) if numeric else [] ]
+            tables.append(table)
+        elif numeric and table[3]:   # the header row doesn't count
+            for i in table[3][:]:
+                cell = cols[i]
+                if not (cell.isdigit() or not cell or NUMERIC.fullmatch(cell)):
+                    table[3].remove(i)
+        table[1] += 1
+        table[2] = list(map(max, table[2], map(len, cols)))
+    return tables
+
+
+def flattened(rows):
+    """ The rows with any line ends in their cells made spaces """
+    for cols in rows:
+        yield [ ' '.join(x.splitlines()) if '\n' in x or '\r' in x else x for x in cols ]
+
+
 def main(textlines, messagefunc, config):
     """
     KlipChop func to to convert CSV into ascii framed table
+    config['table-align'] is left, right, center or numeric to right justify
+    the columns of numbers and left justify the rest.
     """
-    count = 0
-    result = ''
-    tables = list()
-    rows = list()
-    lastlen = 0
-    for line in textlines():
-        if line and line not in result:
-            cols = line.split(config['separator'])
-            if lastlen and lastlen != len(cols):
-                tables.append(rows)
-                rows = list()
-            lastlen = len(cols)
-            rows.append(cols)
-            count += 1
-    tables.append(rows)
-        
-    for t in tables:
-        # transposed list of col lengths:
-        transpose = [ list(map(len, x)) for x in list(map(list, zip(*t))) ]
-        maxw = list(map(max, transpose))
-        table = texttable.Texttable()
-        table.set_cols_width(maxw)
-        table.set_cols_dtype([ 't' ] * len(maxw))
-        table.add_rows(t)
-        result += table.draw()
-        result += '\n'
-
-    messagefunc(f'CSV converted into {count} table rows.')
+    separator = config['separator']
+    align = config.get('table-align', 'left')
+    params, rows = klipcsv.rows(textlines, separator)
+    rows = klipcsv.notblank(rows)   # a blank line would be a table of its own
+    # Only quoted cells can hold line ends, which would break the frame:
+    quoted = any(params.get('quotechar', '"') in x for x in textlines('rawtext'))
+    tables = layout(flattened(rows) if quoted else rows, align == 'numeric')
+
+    output = io.StringIO()
+    _, rows = klipcsv.rows(textlines, separator, params)   # second pass
+    rows = klipcsv.notblank(rows)
+    rows = flattened(rows) if quoted else rows
+    for columns, count, widths, numbers in tables:
+        widths = [ max(x, 1) for x in widths ]
+        rule = '+' + '+'.join('-' * (x + 2) for x in widths) + '+\n'
+        if align == 'numeric':
+            aligns = [ '>' if i in numbers else '<' for i in range(columns) ]
+        else:
+            aligns = [ ALIGN.get(align, '<') ] * columns
+        template = '| ' + ' | '.join(f'{{:{a}{w}}}' for a, w in zip(aligns, widths)) + ' |\n'
+        header = '| ' + ' | '.join(f'{{:<{w}}}' for w in widths) + ' |\n'
+        output.write(rule)
+        for i, cols in enumerate(islice(rows, count)):
+            if i == 0:
+                output.write(header.format(*cols))
+                output.write(rule.replace('-', '='))
+            else:
+                output.write(template.format(*cols))
+                output.write(rule)
+
+    messagefunc(f'CSV converted into {sum(x[1] for x in tables)} table rows.')
+    return output.getvalue()
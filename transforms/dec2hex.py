@@ -2,45 +2,41 @@
 # -*- coding: utf-8 -*-
 # KlipChop menu function
 
-import re
+import klipnumbers
 
 
 # All kllipchop customizable modules must have a main function
 # The main function is passed three variables:
-#   textlines   - Generator of clipboard lines
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
 #   messagefunc - function to call with notification
 #   config      - configuration dictionary
 # The main function should return a string object or a list of strings
 
+CAPABILITIES = {'line_independent', 'raw_lines', 'streaming'}
+SUMMARY = 'Converted {count} numbers to hex'
+
+KINDS = {'decimal', 'binary'}   # klipnumbers.TOKEN kinds converted
+
+
+def hexrender(config):
+    """ Function giving a value's hex text, 0x prefixed if config['hexprefix'] """
+    prefix = config['hexprefix']
+    return lambda value: klipnumbers.hexformat(value, prefix)
+
+
+def mapline(line, config):
+    """
+    The line with its decimal (and binary) numbers converted to hex and how many numbers there were
+    """
+    return klipnumbers.rebase(line, KINDS, hexrender(config))
+
+
 def main(textlines, messagefunc, config):
     """
     KlipChop func to convert decimal numbers to hex
     """
-    # dp = locale.localeconv()['decimal_point']
-    pattern = re.compile(f'(0x[\da-f]+|^[g-z]+[\da-f]+^[g-z]+|\d+)', re.IGNORECASE)
-    hexchars = re.compile(f'(0x[\da-f]+|[a-f]+)', re.IGNORECASE)
-
-    def convert(match):
-        text = match.group()
-        if hexchars.search(text):  # Already hex
-            return text
-        wb = len(text)
-        text = format(int(text), 'x')
-        if config['hexprefix']:
-            text = '0x' + text
-        wa = len(text)
-        if wa < wb:
-            text = ' ' * (wb - wa) + text
-        return text
-
-    result = list()
-    count = 0
-    for line in textlines(type='rawtext'):
-        m = pattern.findall(line)
-        count += len(m)
-        line = pattern.sub(convert, line)
-        result.append(line)
-
-    result = ''.join(result)
-    messagefunc(f'Converted {count} numbers to hex')
-    return result
+    return klipnumbers.rebasepieces(textlines(type='rawtext'), KINDS, hexrender(config),
+        lambda count: messagefunc(SUMMARY.format(count=count)))
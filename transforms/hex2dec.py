@@ -2,42 +2,41 @@
 # -*- coding: utf-8 -*-
 # KlipChop menu function
 
-import re
+import klipnumbers
+
 
 # All kllipchop customizable modules must have a main function
 # The main function is passed three variables:
-#   textlines   - Generator of clipboard lines
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
 #   messagefunc - function to call with notification
 #   config      - configuration dictionary
 # The main function should return a string object or a list of strings
 
+CAPABILITIES = {'line_independent', 'raw_lines', 'streaming'}
+SUMMARY = 'Converted {count} numbers to decimal'
+
+KINDS = {'hex', 'binary'}   # klipnumbers.TOKEN kinds converted
+WORDKINDS = KINDS | {'barehex', 'bytes'}   # with config['hex-words'], eg. 1A, E790 and WWNs
+
+
+def kinds(config):
+    """ The kinds to convert, port and LDEV names and WWNs only when asked """
+    return WORDKINDS if config.get('hex-words', False) else KINDS
+
+
+def mapline(line, config):
+    """
+    The line with its 0x hex (and binary) numbers converted to decimal and how many numbers there were
+    """
+    return klipnumbers.rebase(line, kinds(config), str)
+
+
 def main(textlines, messagefunc, config):
     """
     KlipChop func to convert hex numbers to decimal
     """
-    # dp = locale.localeconv()['decimal_point']
-    pattern = re.compile(f'^(0x)(^[a-z]+[\d]+^[a-z]+)', re.IGNORECASE)
-
-    def convert(match):
-        text = match.group()
-
-        wb = len(text)
-        text = format(int(text), 'x')
-        if config['hexprefix']:
-            text = '0x' + text
-        wa = len(text)
-        if wa < wb:
-            text = ' ' * (wb - wa) + text
-        return text
-
-    result = list()
-    count = 0
-    for line in textlines(type='rawtext'):
-        m = pattern.findall(line)
-        count += len(m)
-        line = pattern.sub(convert, line)
-        result.append(line)
-
-    result = ''.join(result)
-    messagefunc(f'Converted {count} numbers to hex')
-    return result
\ No newline at end of file
+    return klipnumbers.rebasepieces(textlines(type='rawtext'), kinds(config), str,
+        lambda count: messagefunc(SUMMARY.format(count=count)))
@@ -2,21 +2,103 @@
 # -*- coding: utf-8 -*-
 # KlipChop menu function
 
+from itertools import islice
+
 
 # All kllipchop customizable modules must have a main function
 # The main function is passed three variables:
-#   textlines   - Generator of clipboard lines
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
 #   messagefunc - function to call with notification
 #   config      - configuration dictionary
 # The main function should return a string object or a list of strings
 
+CAPABILITIES = {'streaming'}
+
+BATCHLINES = 65536   # lines joined into each piece of the result
+
+
 def main(textlines, messagefunc, config):
     """
     KlipChop func to to join lines together using the joiner character
+    config['join-group'] joins them N at a time, a line of output for each
+    group, and config['join-width'] starts a new output line rather than
+    go past that many characters (a longer line is left on its own).  0 for
+    either is off, with either on blank lines are left out.  The result is
+    streamed out a batch of lines at a time.
     """
-    result = list(textlines())
-    count = len(result)
-    result =  config['joiner'].join(result)
+    joiner = config['joiner']
+    group = wholenumber(config, 'join-group')
+    width = wholenumber(config, 'join-width')
+
+    def done(count, rows):
+        if rows > 1:
+            messagefunc(f'Joined {count} lines into {rows} lines')
+        else:
+            messagefunc(f'Joined {count} lines')
+
+    lines = iter(textlines())
+    if width or group:   # a blank line would be an empty argument
+        lines = filter(None, lines)
+    if width:
+        return wrapped(lines, joiner, group, width, done)
+    if group:
+        return grouped(lines, joiner, group, done)
+    return joined(lines, joiner, done)
+
+
+def wholenumber(config, name):
+    value = config.get(name) or 0
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        raise ValueError(f'{name} must be a whole number, not {value!r}') from None
+
+
+def joined(lines, joiner, done):
+    """ Generator of all the lines joined into one """
+    count = 0
+    while batch := list(islice(lines, BATCHLINES)):
+        text = joiner.join(batch)
+        yield text if not count else joiner + text
+        count += len(batch)
+    done(count, 1 if count else 0)
+
+
+def grouped(lines, joiner, group, done):
+    """ Generator of every group lines joined, a line of output each """
+    count = rows = 0
+    size = group * max(BATCHLINES // group, 1)   # whole groups
+    while batch := list(islice(lines, size)):
+        text = '\n'.join(joiner.join(batch[i:i + group]) for i in range(0, len(batch), group))
+        yield text if not count else '\n' + text
+        count += len(batch)
+        rows += -(-len(batch) // group)
+    done(count, rows)
+
 
-    messagefunc(f'Joined {count} lines')
-    return result
\ No newline at end of file
+def wrapped(lines, joiner, group, width, done):
+    """ Generator of the lines joined into output lines of at most width characters (and group lines) """
+    count = rows = 0
+    output = list()
+    current = list()
+    length = 0
+    for line in lines:
+        count += 1
+        if current and (length + len(joiner) + len(line) > width or len(current) == group):
+            output.append(joiner.join(current))
+            current = list()
+            if len(output) == BATCHLINES:
+                yield '\n'.join(output) if not rows else '\n' + '\n'.join(output)
+                rows += len(output)
+                output = list()
+        length = length + len(joiner) + len(line) if current else len(line)
+        current.append(line)
+    if current:
+        output.append(joiner.join(current))
+    if output:
+        yield '\n'.join(output) if not rows else '\n' + '\n'.join(output)
+        rows += len(output)
+    done(count, rows)
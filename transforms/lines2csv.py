@@ -2,27 +2,35 @@
 # -*- coding: utf-8 -*-
 # KlipChop menu function
 
+import klipcsv
+import klipdedup
+
 
 # All kllipchop customizable modules must have a main function
 # The main function is passed three variables:
-#   textlines   - Generator of clipboard lines
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
 #   messagefunc - function to call with notification
 #   config      - configuration dictionary
 # The main function should return a string object or a list of strings
 
+CAPABILITIES = {'streaming', 'needs_full_input'}
+
+
 def main(textlines, messagefunc, config):
     """
     KlipChop func to to convert lines into a CSV list
     """
-    result = list()
-    count = 0
-    for line in textlines():
-        if line not in result:
-            result.append(line)
-            count += 1
-    
+    budget = klipdedup.budget(config)
+    result = klipdedup.unique(textlines(), budget)
     if config['sort']:
-        result = sorted(result)
-    result = config['separator'].join(result)
-    messagefunc(f'{count} unique lines converted into long CSV list.')
-    return result
+        result = klipdedup.sort(result, budget)
+    quote = klipcsv.quoter(config['separator'])   # lines holding the separator are quoted
+    if isinstance(result, list):
+        messagefunc(f'{len(result)} unique lines converted into long CSV list.')
+        return config['separator'].join(map(quote, result))
+    # Too many to keep in memory, streamed from disk:
+    return klipdedup.joined(map(quote, result), config['separator'],
+        lambda count: messagefunc(f'{count} unique lines converted into long CSV list.'))
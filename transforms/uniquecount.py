@@ -2,18 +2,48 @@
 # -*- coding: utf-8 -*-
 # KlipChop menu function
 
+import klipsketch
+
 
 # All kllipchop customizable modules must have a main function
 # The main function is passed three variables:
-#   textlines   - Generator of clipboard lines
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
 #   messagefunc - function to call with notification
 #   config      - configuration dictionary
 # The main function should return a string object or a list of strings
 
+CAPABILITIES = {'streaming', 'needs_full_input'}
+
+
 def main(textlines, messagefunc, config):
     """
     KlipChop func to to convert text into unique lines
+    config['count-mode'] is exact, top for the count-top most frequent
+    lines or estimate for only the number of unique lines.  top and
+    estimate run in fixed memory however many unique lines there are.
     """
+    mode = config.get('count-mode', 'exact')
+    if mode == 'top':
+        k = config['count-top']
+        counter = klipsketch.SpaceSaving(k * 10)
+        distinct = klipsketch.HyperLogLog()
+        klipsketch.feed((counter, distinct), textlines())
+        top = counter.top(k)
+        result = [ f'{x} #{y}' for x, y, _ in top ]
+        error = max((e for _, _, e in top), default=0)
+        messagefunc(f'{len(result)} most frequent of about {distinct.estimate():,d} unique lines'
+            + (f', counts over by at most {error}' if error else ''))
+        return result
+    if mode == 'estimate':
+        distinct = klipsketch.HyperLogLog()
+        klipsketch.feed((distinct,), textlines())
+        count = distinct.estimate()
+        messagefunc(f'About {count:,d} unique lines (within {distinct.relativeerror:.1%})')
+        return [ f'unique lines #{count}' ]
+
     counter = dict()
 
     for line in textlines():
@@ -25,6 +55,5 @@ def main(textlines, messagefunc, config):
     else:
         result = [ f'{x} #{y}' for x,y in counter.items()]
 
-    result = '\n'.join(result)
     messagefunc(f'{len(counter.keys())} unique lines')
     return result
\ No newline at end of file
@@ -2,27 +2,32 @@
 # -*- coding: utf-8 -*-
 # KlipChop menu function
 
+import klipdedup
+
 
 # All kllipchop customizable modules must have a main function
 # The main function is passed three variables:
-#   textlines   - Generator of clipboard lines
+#   textlines   - Function returning the clipboard lines (stripped), iterate them as often
+#                 as needed.  On clipboard runs they also support len() and indexing.
+#                 textlines('rawtext') gives the unsplit text (in pieces when streamed).
+#                 textlines('cells') gives the rows of cells of a spreadsheet copy, or None.
 #   messagefunc - function to call with notification
 #   config      - configuration dictionary
 # The main function should return a string object or a list of strings
 
+CAPABILITIES = {'streaming', 'needs_full_input'}
+
+
 def main(textlines, messagefunc, config):
     """
     KlipChop func to to convert text into unique lines
     """
-    result = list()
-    count = 0
-    for line in textlines():
-        if line not in result:
-            result.append(line)
-            count += 1
-    
+    budget = klipdedup.budget(config)
+    result = klipdedup.unique(textlines(), budget)
     if config['sort']:
-        result = sorted(result)
-    result = '\n'.join(result)
-    messagefunc(f'{count} unique lines')
-    return result
\ No newline at end of file
+        result = klipdedup.sort(result, budget)
+    if isinstance(result, list):
+        messagefunc(f'{len(result)} unique lines')
+        return result
+    # Too many to keep in memory, streamed from disk:
+    return klipdedup.joined(result, '\n', lambda count: messagefunc(f'{count} unique lines'))